@@ -0,0 +1,152 @@
+"""Headless batch runner: replays a JSONL file of MCP operations and reports throughput and latency.
+
+Each input line is one operation:
+
+    {"id": "a", "type": "tool", "name": "create_user_tool", "arguments": {"user": {"name": "Ann", "email": "ann@example.com"}}}
+    {"id": "b", "type": "resource", "uri": "users://1/profile"}
+    {"id": "c", "type": "prompt", "name": "generate-fake-user", "arguments": {"name": "Ann"}}
+
+Usage:
+
+    uv run src/batch.py traffic.jsonl --out results.jsonl --concurrency 16 --sessions 2
+
+USERS_* variables are passed on to spawned servers. Every spawned session is its own server process, so
+--sessions > 1 is refused unless it attaches to one shared server with --url or USERS_STORAGE=sqlite is set.
+"""
+import argparse
+import asyncio
+import json
+import os
+import shlex
+import sys
+import time
+from typing import Any, Dict, List, Optional, TextIO
+from dotenv import load_dotenv
+import mcp.types as types
+from mcp.client.session import ClientSession
+from mcp.shared.context import RequestContext
+from llm import LLM, createLLM
+from session_pool import SessionPool
+from stats import formatSummary, summarize
+
+DEFAULT_SERVER = "uv run src/server.py"
+
+
+def serverEnv() -> Dict[str, str]:
+    """Server configuration to forward to spawned servers (stdio_client only passes a minimal environment)"""
+    return {key: value for key, value in os.environ.items() if key.startswith("USERS_")}
+
+
+def makeSamplingCallback(llm: LLM):
+    """Answer server sampling requests straight from the model, without asking anyone"""
+    async def handle_sampling_message(
+        context: RequestContext[ClientSession, None],
+        params: types.CreateMessageRequestParams) -> types.CreateMessageResult:
+        texts = []
+        for message in params.messages:
+            if message.content.type == "text":
+                response = await llm.generate(message.content.text)
+                if response.text: texts.append(response.text)
+        return types.CreateMessageResult(
+            role="assistant",
+            model=llm.model,
+            stopReason="endTurn",
+            content=types.TextContent(type="text", text="\n".join(texts)),
+        )
+    return handle_sampling_message
+
+
+async def execute(session: ClientSession, op: Dict[str, Any]) -> Any:
+    match op.get("type"):
+        case "tool":
+            result = await session.call_tool(op["name"], arguments=op.get("arguments") or {})
+        case "resource":
+            result = await session.read_resource(op["uri"])
+        case "prompt":
+            result = await session.get_prompt(op["name"], arguments=op.get("arguments") or {})
+        case other:
+            raise ValueError(f"Unknown operation type: {other}")
+    return result.model_dump(mode="json", exclude_none=True)
+
+
+async def runBatch(
+    source: TextIO,
+    out: TextIO,
+    server: List[str],
+    sessions: int = 1,
+    concurrency: int = 8,
+    url: Optional[str] = None,
+) -> Dict[str, Any]:
+    latencies: List[float] = []
+    errors = 0
+    sampling = makeSamplingCallback(createLLM())
+
+    async with SessionPool(url=url, command=server, size=sessions, env=serverEnv(), sampling_callback=sampling) as pool:
+        clients = pool.sessions
+
+        # Bounded queue: the file is streamed, never loaded whole
+        queue: asyncio.Queue = asyncio.Queue(maxsize=concurrency * 2)
+
+        async def produce() -> None:
+            for line_no, line in enumerate(source, start=1):
+                if line.strip():
+                    await queue.put((line_no, line))
+            for _ in range(concurrency):
+                await queue.put(None)
+
+        async def work(worker: int) -> None:
+            nonlocal errors
+            session = clients[worker % len(clients)]
+            while (item := await queue.get()) is not None:
+                line_no, line = item
+                record: Dict[str, Any] = {"line": line_no}
+                start = time.perf_counter()
+                try:
+                    op = json.loads(line)
+                    record.update(id=op.get("id"), type=op.get("type"))
+                    record["result"] = await execute(session, op)
+                    record["ok"] = not record["result"].get("isError", False)
+                except Exception as e:
+                    record.update(ok=False, error=str(e))
+                elapsed = time.perf_counter() - start
+                record["latency_ms"] = round(elapsed * 1000, 3)
+                latencies.append(elapsed)
+                if not record["ok"]:
+                    errors += 1
+                out.write(json.dumps(record) + "\n")
+
+        started = time.perf_counter()
+        await asyncio.gather(produce(), *[work(i) for i in range(concurrency)])
+        elapsed = time.perf_counter() - started
+
+    out.flush()
+    return summarize(latencies, elapsed, errors)
+
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Replay a JSONL file of MCP tool calls, resource reads and prompts")
+    parser.add_argument("input", help="JSONL file of operations ('-' for stdin)")
+    parser.add_argument("--out", default="-", help="JSONL results file ('-' for stdout)")
+    parser.add_argument("--sessions", type=int, default=1, help="MCP sessions (server processes) to spread operations over")
+    parser.add_argument("--concurrency", type=int, default=8, help="operations in flight")
+    parser.add_argument("--server", default=DEFAULT_SERVER, help="command that starts the MCP server on stdio")
+    parser.add_argument("--url", help="attach to a running server (streamable HTTP, or SSE for .../sse) instead of spawning one")
+    args = parser.parse_args()
+
+    if args.sessions > 1 and args.url is None and os.getenv("USERS_STORAGE", "json") != "sqlite":
+        # Each spawned server holds its own in-memory JSON table and would assign the same ids
+        parser.error("--sessions > 1 needs --url or USERS_STORAGE=sqlite")
+
+    source = sys.stdin if args.input == "-" else open(args.input, "r")
+    out = sys.stdout if args.out == "-" else open(args.out, "w")
+    try:
+        summary = asyncio.run(runBatch(source, out, shlex.split(args.server), args.sessions, args.concurrency, args.url))
+    finally:
+        if source is not sys.stdin: source.close()
+        if out is not sys.stdout: out.close()
+    print(formatSummary("batch", summary), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+"""Benchmark for the server's tools and resources across dataset sizes.
+
+For every size a synthetic users.json is generated. Each scenario runs in a fresh worker process, so server
+startup (loading the store) is measured too:
+
+  - inprocess: the handler coroutines are awaited directly
+  - stdio: the same operations go through a real MCP stdio session
+
+Reported per operation: ops/s and p50/p95/p99 latency. Reported per scenario: store load time, peak RSS and
+bytes written to disk per create (block I/O accounting, so keep --dir off tmpfs). Every scenario runs --repeat
+times and each metric is the median of those runs. The baseline comparison skips latency statistics that too
+few operations back (p95 needs 100 ops, p99 500).
+
+Usage:
+
+    uv run src/bench.py --sizes 1000 100000 1000000 --save bench/baseline.json
+    uv run src/bench.py --sizes 1000 100000 --baseline bench/baseline.json --threshold 0.2
+
+USERS_* variables (e.g. USERS_STORAGE=sqlite) configure the benchmarked server.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+from stats import formatSummary, summarize
+
+SRC_DIR = Path(__file__).resolve().parent
+OPERATIONS = ("create_user_tool", "get_user_details_resource", "get_all_users_resource")
+# Metrics where a higher value is worse; everything else compared is "higher is better" (ops_per_s)
+LOWER_IS_BETTER = ("p50_ms", "p95_ms", "p99_ms", "load_s", "peak_rss_mb", "bytes_written_per_create")
+# Share of an operation's samples at or beyond each gated statistic. A statistic is only compared once
+# MIN_TAIL_SAMPLES samples back it (p95 needs 100 ops, p99 500), otherwise it is a single noisy call
+TAIL_SHARE = {"ops_per_s": 0.5, "p50_ms": 0.5, "p95_ms": 0.05, "p99_ms": 0.01}
+MIN_TAIL_SAMPLES = 5
+
+
+def generateUsers(path: Path, size: int) -> None:
+    """Write a users.json of `size` users in the same layout as data/users.json"""
+    users = [
+        {
+            "id": i,
+            "name": f"User {i}",
+            "email": f"user{i}@example.com",
+            "address": f"{i} Main St, Springfield, IL",
+            "phone": f"555-{i % 10000:04d}"
+        }
+        for i in range(1, size + 1)
+    ]
+    with open(path, 'w') as f:
+        json.dump(users, f, indent=4)
+
+
+def peakRssMb(who: int) -> float:
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    maxrss = resource.getrusage(who).ru_maxrss
+    return round(maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def blocksWritten(who: int) -> int:
+    return resource.getrusage(who).ru_oublock * 512
+
+
+async def timeOps(count: int, op) -> List[float]:
+    latencies = []
+    for i in range(count):
+        start = time.perf_counter()
+        await op(i)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def newUser(i: int) -> Dict[str, Any]:
+    return {"name": f"Bench {i}", "email": f"bench-{os.getpid()}-{i}-{time.time_ns()}@example.com"}
+
+
+async def runInProcess(size: int, ops: int, all_ops: int) -> Dict[str, Any]:
+    start = time.perf_counter()
+    sys.path.insert(0, str(SRC_DIR))
+    import server
+    load_s = time.perf_counter() - start
+
+    results: Dict[str, Any] = {"load_s": round(load_s, 3)}
+    written = blocksWritten(resource.RUSAGE_SELF)
+    latencies = await timeOps(ops, lambda i: server.create_user_tool(server.UserSchema(**newUser(i))))
+    await server.store.close()
+    results["bytes_written_per_create"] = round((blocksWritten(resource.RUSAGE_SELF) - written) / ops)
+    results["create_user_tool"] = summarize(latencies, sum(latencies))
+
+    latencies = await timeOps(ops, lambda i: server.get_user_details_resource(random.randint(1, size)))
+    results["get_user_details_resource"] = summarize(latencies, sum(latencies))
+    latencies = await timeOps(all_ops, lambda i: server.get_all_users_resource())
+    results["get_all_users_resource"] = summarize(latencies, sum(latencies))
+
+    results["peak_rss_mb"] = peakRssMb(resource.RUSAGE_SELF)
+    return results
+
+
+async def runStdio(size: int, ops: int, all_ops: int) -> Dict[str, Any]:
+    from mcp.client.session import ClientSession
+    from mcp.client.stdio import StdioServerParameters, stdio_client
+    from batch import serverEnv
+
+    env = serverEnv()
+    params = StdioServerParameters(command=sys.executable, args=[str(SRC_DIR / "server.py")], env=env)
+    results: Dict[str, Any] = {}
+    start = time.perf_counter()
+    async with stdio_client(params) as (read, write):
+        async with ClientSession(read, write) as session:
+            await session.initialize()
+            results["load_s"] = round(time.perf_counter() - start, 3)
+
+            latencies = await timeOps(ops, lambda i: session.call_tool("create_user_tool", {"user": newUser(i)}))
+            results["create_user_tool"] = summarize(latencies, sum(latencies))
+            latencies = await timeOps(ops, lambda i: session.read_resource(f"users://{random.randint(1, size)}/profile"))
+            results["get_user_details_resource"] = summarize(latencies, sum(latencies))
+            latencies = await timeOps(all_ops, lambda i: session.read_resource("users://all"))
+            results["get_all_users_resource"] = summarize(latencies, sum(latencies))
+
+    # The server has exited, so its resource usage is now accounted to us as a child
+    results["bytes_written_per_create"] = round(blocksWritten(resource.RUSAGE_CHILDREN) / ops)
+    results["peak_rss_mb"] = peakRssMb(resource.RUSAGE_CHILDREN)
+    return results
+
+
+def runWorker(mode: str, size: int, data_path: Path, ops: int, all_ops: int) -> Dict[str, Any]:
+    """Run one scenario in a fresh interpreter against a private copy of the generated data"""
+    workdir = Path(tempfile.mkdtemp(dir=data_path.parent))
+    try:
+        shutil.copy(data_path, workdir / "users.json")
+        env = {**os.environ, "USERS_DATA_PATH": str(workdir / "users.json"), "USERS_DB_PATH": str(workdir / "users.db")}
+        proc = subprocess.run(
+            [sys.executable, __file__, "--worker", mode, "--size", str(size), "--ops", str(ops), "--all-ops", str(all_ops)],
+            env=env, capture_output=True, text=True,
+        )
+        if proc.returncode != 0:
+            raise RuntimeError(f"{mode} worker failed for size {size}:\n{proc.stderr}")
+        return json.loads(proc.stdout.strip().splitlines()[-1])
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def medianScenario(runs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Per-metric median of repeated runs of one scenario, so a single slow run does not look like a regression"""
+    def median(values: List[Any]) -> Any:
+        if isinstance(values[0], dict):
+            return {key: median([value[key] for value in values]) for key in values[0]}
+        if isinstance(values[0], (int, float)) and not isinstance(values[0], bool):
+            return round(statistics.median(values), 3)
+        return values[0]
+
+    return median(runs)
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """List every metric that got worse than the baseline by more than `threshold` (a fraction).
+
+    Per-operation statistics are skipped when either run has too few samples for them (see TAIL_SHARE)
+    """
+    regressions = []
+
+    def check(path: str, current: Any, previous: Any, metric: str) -> None:
+        if not isinstance(current, (int, float)) or not isinstance(previous, (int, float)) or previous == 0:
+            return
+        change = (current - previous) / previous
+        worse = change > threshold if metric in LOWER_IS_BETTER else -change > threshold
+        if worse:
+            regressions.append(f"{path}: {previous} -> {current} ({change:+.0%})")
+
+    for size, modes in results.items():
+        for mode, scenario in modes.items():
+            previous_scenario = baseline.get(size, {}).get(mode)
+            if not previous_scenario:
+                continue
+            for key, value in scenario.items():
+                previous = previous_scenario.get(key)
+                if isinstance(value, dict) and isinstance(previous, dict):
+                    ops = min(value.get("ops", 0), previous.get("ops", 0))
+                    for metric, share in TAIL_SHARE.items():
+                        if ops * share < MIN_TAIL_SAMPLES:
+                            continue
+                        check(f"{size}/{mode}/{key}/{metric}", value.get(metric), previous.get(metric), metric)
+                else:
+                    check(f"{size}/{mode}/{key}", value, previous, key)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark server tools and resources across dataset sizes")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 100000, 1000000], help="users in the generated dataset")
+    parser.add_argument("--modes", nargs="+", choices=["inprocess", "stdio"], default=["inprocess", "stdio"])
+    parser.add_argument("--ops", type=int, default=200, help="creates and single-user reads per scenario")
+    parser.add_argument("--all-ops", type=int, default=10, help="users://all reads per scenario (10 or more to gate them)")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per scenario; the median of each metric is reported")
+    parser.add_argument("--dir", default=None, help="directory for generated data (default: system temp dir)")
+    parser.add_argument("--save", help="write the results as a baseline JSON file")
+    parser.add_argument("--baseline", help="compare against a baseline JSON file; exit 1 on regression")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed relative regression, e.g. 0.2 for 20%%")
+    parser.add_argument("--worker", choices=["inprocess", "stdio"], help=argparse.SUPPRESS)
+    parser.add_argument("--size", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run = runInProcess if args.worker == "inprocess" else runStdio
+        print(json.dumps(asyncio.run(run(args.size, args.ops, args.all_ops))))
+        return
+
+    results: Dict[str, Any] = {}
+    datadir = Path(tempfile.mkdtemp(dir=args.dir, prefix="mcp-bench-"))
+    try:
+        for size in args.sizes:
+            data_path = datadir / f"users-{size}.json"
+            generateUsers(data_path, size)
+            results[str(size)] = {}
+            for mode in args.modes:
+                scenario = medianScenario([runWorker(mode, size, data_path, args.ops, args.all_ops) for _ in range(args.repeat)])
+                results[str(size)][mode] = scenario
+                print(f"[{size} users, {mode}] load {scenario['load_s']}s, peak RSS {scenario['peak_rss_mb']}MB, "
+                      f"{scenario['bytes_written_per_create']} bytes written per create")
+                for op in OPERATIONS:
+                    print("  " + formatSummary(op, scenario[op]))
+            data_path.unlink()
+    finally:
+        shutil.rmtree(datadir, ignore_errors=True)
+
+    if args.save:
+        Path(args.save).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.save).write_text(json.dumps(results, indent=2))
+
+    if args.baseline:
+        regressions = compare(results, json.loads(Path(args.baseline).read_text()), args.threshold)
+        if regressions:
+            print(f"Regressions beyond {args.threshold:.0%}:")
+            for regression in regressions:
+                print("  " + regression)
+            sys.exit(1)
+        print("No regressions against baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,32 +3,66 @@ import os
 import asyncio
 import json
 import re
-from typing import List
+from typing import Any, AsyncIterator, Dict, List
 from pydantic import AnyUrl
-from server import UserSchema
 import mcp.types as types
 from mcp.shared.exceptions import McpError
 from mcp.client.session import ClientSession
-from mcp.client.stdio import StdioServerParameters, stdio_client
 from mcp.shared.context import RequestContext
-import inquirer
-from inquirer.themes import GreenPassion
-from google import genai
-from google.genai import types as genai_types
+from schemas import UserSchema
+from session_pool import SessionPool
 
 load_dotenv()
 
-google = genai.Client(api_key=os.getenv('GEMINI_API_KEY'))
+# Budget of the agentic tool loop behind "Query"
+QUERY_MAX_STEPS = int(os.getenv('QUERY_MAX_STEPS', '8'))
+QUERY_TIMEOUT = float(os.getenv('QUERY_TIMEOUT', '120'))
+
+# google-genai takes longer to import than everything else together, so the model and the Gemini
+# tool declarations are set up on first use (a query or a sampling request), not at startup
+llm = None
+toolDeclarations = None
+toolsChanged = False # set on notifications/tools/list_changed
+# inquirer (~90ms) is imported on a worker thread while the server starts, instead of before it
+inquirer = None
+GreenPassion = None
+
+
+def getLLM():
+    global llm
+    if llm is None:
+        from llm import createLLM
+        llm = createLLM()
+    return llm
+
+
+def loadInquirer() -> None:
+    global inquirer, GreenPassion
+    if inquirer is None:
+        from inquirer.themes import GreenPassion as theme
+        import inquirer as module
+        GreenPassion, inquirer = theme, module
+
+
+def getToolDeclarations():
+    global toolDeclarations
+    if toolDeclarations is None:
+        from gemini_tools import ToolDeclarationCache
+        toolDeclarations = ToolDeclarationCache()
+    return toolDeclarations
 
 
 async def handle_sampling_message(
     context: RequestContext[ClientSession, None],
     params: types.CreateMessageRequestParams) -> types.CreateMessageResult:
-    print(f"Sampling request: {params.messages}")
+    # Background requests (e.g. the server refilling its fake user pool) run without asking
+    background = bool((params.metadata or {}).get("background"))
+    if not background:
+        print(f"Sampling request: {params.messages}")
 
     texts = list()
     for message in params.messages:
-        text = await handleServerMessagePrompt(message)
+        text = await handleServerMessagePrompt(message, confirm=not background)
         if text: texts.append(text)
 
     return types.CreateMessageResult(
@@ -42,151 +76,158 @@ async def handle_sampling_message(
     )
 
 
-async def main():
-    async with stdio_client(
-        StdioServerParameters(command="uv", args=["run", "src/server.py"])
-    ) as (read, write):
-        async with ClientSession(read, write, sampling_callback=handle_sampling_message) as session:
-            await session.initialize()
+async def handle_message(message) -> None:
+    global toolsChanged
+    if isinstance(message, types.ServerNotification) and isinstance(message.root, types.ToolListChangedNotification):
+        toolsChanged = True
+        if toolDeclarations is not None:
+            toolDeclarations.invalidate()
 
-            # List available tools
-            tools_session = await session.list_tools()
-            #print("tools", tools_session.tools)
 
-            # List available prompts
-            prompts_session = await session.list_prompts()
-            #print("prompts", prompts)
+async def main():
+    global toolsChanged
+    menuReady = asyncio.create_task(asyncio.to_thread(loadInquirer))
+    # MCP_SERVER_URL attaches to an already running server (streamable HTTP or SSE) instead of spawning one
+    async with SessionPool(
+        url=os.getenv('MCP_SERVER_URL'),
+        sampling_callback=handle_sampling_message,
+        message_handler=handle_message,
+    ) as pool:
+        session = pool.session()
 
-            # List available resources
-            resources_session = await session.list_resources()
-            #print("resources", resources)
+        # Tools, prompts, resources and resource templates, listed concurrently or read from the discovery cache
+        discovery = await pool.discover()
+        tools_session = discovery.tools
+        prompts_session = discovery.prompts
+        resources_session = discovery.resources
+        resource_templates_session = discovery.resource_templates
 
-            # List available resource templates
-            resource_templates_session = await session.list_resource_templates()
-            #print("resource_templates", resource_templates)
+        print("You are connected")
+        await menuReady
+        while True:
+            options = [
+                inquirer.List(
+                    'option',
+                    message="What would you like to do",
+                    choices=["Query", "Tools", "Resources", "Prompts", "Quit"]
+                )
+            ]
+            option = inquirer.prompt(options, theme=GreenPassion())['option']
+            if option == None:
+                break
+            if toolsChanged: #server sent notifications/tools/list_changed
+                tools_session = await session.list_tools()
+                toolsChanged = False
+            match option:
 
-            print("You are connected")
-            while True:
-                options = [
-                    inquirer.List(
-                        'option',
-                        message="What would you like to do",
-                        choices=["Query", "Tools", "Resources", "Prompts", "Quit"]
+                case "Tools":
+                    tools_choices = list(
+                        map(lambda t: {
+                            "name": getattr(getattr(t, 'annotations', None), 'title', None) or t.name,
+                            "value": t.name,
+                            "description": t.description
+                        }, tools_session.tools)
                     )
-                ]
-                option = inquirer.prompt(options, theme=GreenPassion())['option']
-                if option == None:
-                    break
-                match option:
-
-                    case "Tools":
-                        tools_choices = list(
-                            map(lambda t: {
-                                "name": getattr(getattr(t, 'annotations', None), 'title', None) or t.name,
-                                "value": t.name,
-                                "description": t.description
-                            }, tools_session.tools)
+                    toolName = [
+                        inquirer.List(
+                            'toolName',
+                            message="Select a tool",
+                            choices=[choice["name"] for choice in tools_choices]
                         )
-                        toolName = [
-                            inquirer.List(
-                                'toolName',
-                                message="Select a tool",
-                                choices=[choice["name"] for choice in tools_choices]
-                            )
-                        ]
-                        toolNameOption = inquirer.prompt(toolName, theme=GreenPassion())['toolName']
-                        tool = [t for t in tools_session.tools if (getattr(getattr(t, 'annotations', None), 'title', None) or t.name) == toolNameOption][0]
-                        if not tool:
-                            print("Tool not found")
-                        else:
-                            print(f"You selected tool: {tool.name}")
-                            await handleTool(session, tool)
-
-                    case "Resources":
-                        print("Available resources:")
-                        resources_choices = list(
-                            map(lambda r: {
-                                "name": r.name,
-                                "value": r.uri,
-                                "description": r.description
-                            }, resources_session.resources)
+                    ]
+                    toolNameOption = inquirer.prompt(toolName, theme=GreenPassion())['toolName']
+                    tool = [t for t in tools_session.tools if (getattr(getattr(t, 'annotations', None), 'title', None) or t.name) == toolNameOption][0]
+                    if not tool:
+                        print("Tool not found")
+                    else:
+                        print(f"You selected tool: {tool.name}")
+                        await handleTool(session, tool)
+
+                case "Resources":
+                    print("Available resources:")
+                    resources_choices = list(
+                        map(lambda r: {
+                            "name": r.name,
+                            "value": r.uri,
+                            "description": r.description
+                        }, resources_session.resources)
+                    )
+                    resource_templates_choices = list(
+                        map(lambda r: {
+                            "name": r.name,
+                            "value": r.uriTemplate,
+                            "description": r.description
+                            }, resource_templates_session.resourceTemplates)
+                    )
+                    
+                    resources_all = resources_choices + resource_templates_choices
+                    resourceUri = [
+                        inquirer.List(
+                            'resourceUri',
+                            message="Select a resource",
+                            choices=[choice["value"] for choice in resources_all]
                         )
-                        resource_templates_choices = list(
-                            map(lambda r: {
-                                "name": r.name,
-                                "value": r.uriTemplate,
-                                "description": r.description
-                                }, resource_templates_session.resourceTemplates)
+                    ]
+                    resourceUriOption = inquirer.prompt(resourceUri, theme=GreenPassion())['resourceUri']
+                    uri = [r for r in resources_session.resources if r.uri == resourceUriOption]
+                    if not uri:
+                        uri = [r for r in resource_templates_session.resourceTemplates if r.uriTemplate == resourceUriOption]
+                    if not uri:
+                        print("Resource not found")
+                    else:
+                        print(f"You selected resource: {uri[0].name}")
+                        uri = uri[0].uri if hasattr(uri[0],"uri") else uri[0].uriTemplate
+                        await handleResource(session, uri)
+
+                case "Prompts":
+                    print("Available prompts:")
+                    prompts_choices = list(
+                        map(lambda p: {
+                            "name": p.name,
+                            "value": p.name,
+                            "description": p.description
+                        }, prompts_session.prompts)
+                    )
+                    promptName = [
+                        inquirer.List(
+                            'promptName',
+                            message="Select a prompt",
+                            choices=[choice["name"] for choice in prompts_choices]
                         )
-                        
-                        resources_all = resources_choices + resource_templates_choices
-                        resourceUri = [
-                            inquirer.List(
-                                'resourceUri',
-                                message="Select a resource",
-                                choices=[choice["value"] for choice in resources_all]
+                    ]
+                    promptNameOption = inquirer.prompt(promptName, theme=GreenPassion())['promptName']
+                    prompt = [p for p in prompts_session.prompts if p.name == promptNameOption][0]
+                    print("prompt", prompt)
+                    if not prompt:
+                        print("Prompt not found")
+                    else:
+                        print(f"You selected prompt: {prompt.name}")
+                        params = {}
+                        for p in prompt.arguments:
+                            param_name = p.name
+                            param_question = inquirer.Text(
+                                param_name,
+                                message=f"Enter value for {param_name}:"
                             )
-                        ]
-                        resourceUriOption = inquirer.prompt(resourceUri, theme=GreenPassion())['resourceUri']
-                        uri = [r for r in resources_session.resources if r.uri == resourceUriOption]
-                        if not uri:
-                            uri = [r for r in resource_templates_session.resourceTemplates if r.uriTemplate == resourceUriOption]
-                        if not uri:
-                            print("Resource not found")
-                        else:
-                            print(f"You selected resource: {uri[0].name}")
-                            uri = uri[0].uri if hasattr(uri[0],"uri") else uri[0].uriTemplate
-                            await handleResource(session, uri)
-
-                    case "Prompts":
-                        print("Available prompts:")
-                        prompts_choices = list(
-                            map(lambda p: {
-                                "name": p.name,
-                                "value": p.name,
-                                "description": p.description
-                            }, prompts_session.prompts)
+                            answer = inquirer.prompt([param_question], theme=GreenPassion())
+                            params[param_name] = answer[param_name]
+
+                        result = await session.get_prompt(
+                            prompt.name,
+                            arguments=params
                         )
-                        promptName = [
-                            inquirer.List(
-                                'promptName',
-                                message="Select a prompt",
-                                choices=[choice["name"] for choice in prompts_choices]
-                            )
-                        ]
-                        promptNameOption = inquirer.prompt(promptName, theme=GreenPassion())['promptName']
-                        prompt = [p for p in prompts_session.prompts if p.name == promptNameOption][0]
-                        print("prompt", prompt)
-                        if not prompt:
-                            print("Prompt not found")
-                        else:
-                            print(f"You selected prompt: {prompt.name}")
-                            params = {}
-                            for p in prompt.arguments:
-                                param_name = p.name
-                                param_question = inquirer.Text(
-                                    param_name,
-                                    message=f"Enter value for {param_name}:"
-                                )
-                                answer = inquirer.prompt([param_question], theme=GreenPassion())
-                                params[param_name] = answer[param_name]
-
-                            result = await session.get_prompt(
-                                prompt.name,
-                                arguments=params
-                            )
-                            #print(f"Prompt result: {result.messages[0].content}")
-                            for message in result.messages:
-                                print(await handleServerMessagePrompt(message))
-                            
-                    case "Query":
-                        print("You selected Query")
-                        await handleQuery(session, tools_session.tools)
-
-                    case "Quit":
-                        print("Exiting...")
-                        return
-                    
+                        #print(f"Prompt result: {result.messages[0].content}")
+                        for message in result.messages:
+                            print(await handleServerMessagePrompt(message))
+                        
+                case "Query":
+                    print("You selected Query")
+                    await handleQuery(session, tools_session.tools)
+
+                case "Quit":
+                    print("Exiting...")
+                    return
+                
 
 async def handleQuery(session: ClientSession, toolsSession: List[types.Tool]) -> None:
     query = inquirer.Text(
@@ -195,83 +236,46 @@ async def handleQuery(session: ClientSession, toolsSession: List[types.Tool]) ->
     )
     queryPrompt = inquirer.prompt([query], theme=GreenPassion())['query']
     
-    tools, tool_type = [], None
-    for tool in toolsSession:
-        if '$defs' in tool.inputSchema: #if inputs has a pydantic schema
-            mySchema = list(tool.inputSchema['$defs'].keys())[0]
-            myProperties = dict()
-            myProperties[tool.inputSchema['required'][0]] = {
-                    "type": tool.inputSchema['$defs'][mySchema].get('type', "object"),
-                    "properties": tool.inputSchema['$defs'][mySchema]['properties'],
-                    "required": tool.inputSchema['$defs'][mySchema].get('required', [])
-                }
-            print("myProperties", myProperties)
-            tool_type = genai_types.Tool(
-                        function_declarations=[
-                            {
-                                "name": tool.name,
-                                "description": tool.description or "",
-                                "parameters": {
-                                    "type": tool.inputSchema['$defs'][mySchema].get('type', "object"),
-                                    "properties": myProperties,
-                                    "required": tool.inputSchema['required']
-                                }
-                            }
-                        ]
-                    )                 
-        else: #no pydantic schema
-            tool_type = genai_types.Tool(
-                        function_declarations=[
-                            {
-                                "name": tool.name,
-                                "description": tool.description or "",
-                                "parameters": {
-                                    "type": tool.inputSchema['type'],
-                                    "properties": tool.inputSchema['properties'],
-                                    "required": tool.inputSchema.get('required', [])
-                                }
-                            }
-                        ]
-                    )
-        tools.append(tool_type)
-    print("tools", tools)
-
-    response = google.models.generate_content(
-        model='models/gemini-2.5-flash',
-        contents=queryPrompt,
-        config=genai_types.GenerateContentConfig(
-            tools=tools,
-        ),
+    from query_engine import QueryEngine
+    engine = QueryEngine(
+        session,
+        getLLM(),
+        max_steps=QUERY_MAX_STEPS,
+        timeout=QUERY_TIMEOUT,
+        on_tool_result=lambda name, result: print(f"{name} Tool result: {result}"),
     )
-    
-    if response.candidates[0].content.parts[0].function_call:
-        tool_call = response.candidates[0].content.parts[0].function_call
-        result = await session.call_tool(
-                    tool_call.name,
-                    arguments={**tool_call.args}
-                )
-        print(f"{tool_call.name} Tool result: {result.content[0].text}")
-    else:
-        print(f"No function call:{response.text}")
+    try:
+        answer = await engine.run(queryPrompt, getToolDeclarations().get(toolsSession))
+    except asyncio.TimeoutError:
+        print(f"Query timed out after {QUERY_TIMEOUT}s")
+        return
+    print(answer)
 
 
 async def handleTool(session: ClientSession, tool: types.Tool) -> None:
-    args, arguments = {}, {}
+    arguments = {}
     if '$defs' in tool.inputSchema: #if inputs has a pydantic schema
         theSchema = list(tool.inputSchema['$defs'].keys())[0]
-        for key, val in tool.inputSchema['$defs'][theSchema]['properties'].items():
-            param_name, param_type = key, None
-            if 'anyOf' in val: #optional params
-                param_type = [v['type'] for v in val.get('anyOf')]
-            else: #required params
-                param_type = val.get('type')
+        param = tool.inputSchema['required'][0]
+        if tool.inputSchema['properties'][param].get('type') == 'array': #list of pydantic schemas
+            items = []
+            while True:
+                items.append(promptSchema(tool.inputSchema['$defs'][theSchema]))
+                more = inquirer.Confirm("more", message="Add another entry", default=False)
+                if not inquirer.prompt([more], theme=GreenPassion())['more']:
+                    break
+            arguments = {param: items}
+        else:
+            arguments = {param: promptSchema(tool.inputSchema['$defs'][theSchema])}
+    else: #plain params, blank answers fall back to the tool defaults
+        for param_name, val in tool.inputSchema.get('properties', {}).items():
             param_question = inquirer.Text(
                 param_name,
-                message=f"Enter value for {param_name} ({param_type}):"
+                message=f"Enter value for {param_name} ({val.get('type') or [v['type'] for v in val.get('anyOf', [])]}):"
             )
-            answer = inquirer.prompt([param_question], theme=GreenPassion())
-            args[param_name] = answer[param_name]
-        arguments = {"user": UserSchema(**args).model_dump()}
+            answer = inquirer.prompt([param_question], theme=GreenPassion())[param_name]
+            if answer:
+                arguments[param_name] = answer
 
     result = await session.call_tool(
         tool.name,
@@ -280,6 +284,23 @@ async def handleTool(session: ClientSession, tool: types.Tool) -> None:
     print("Tool result:", result.content[0].text)
 
 
+def promptSchema(schema: dict) -> dict:
+    args = {}
+    for key, val in schema['properties'].items():
+        param_name, param_type = key, None
+        if 'anyOf' in val: #optional params
+            param_type = [v['type'] for v in val.get('anyOf')]
+        else: #required params
+            param_type = val.get('type')
+        param_question = inquirer.Text(
+            param_name,
+            message=f"Enter value for {param_name} ({param_type}):"
+        )
+        answer = inquirer.prompt([param_question], theme=GreenPassion())
+        args[param_name] = answer[param_name]
+    return UserSchema(**args).model_dump()
+
+
 async def handleResource(session: ClientSession, uri: AnyUrl | str) -> None:
     finalUri = str(uri)
     if "{" in finalUri and "}" in finalUri:
@@ -292,6 +313,10 @@ async def handleResource(session: ClientSession, uri: AnyUrl | str) -> None:
             answer = inquirer.prompt([param_question], theme=GreenPassion())
             finalUri = finalUri.replace(f"{{{param}}}", str(answer[param]))
     try:
+        if finalUri == "users://all": #stream the users page by page instead of loading the full list
+            async for users in iterUserPages(session):
+                print(json.dumps(users, indent=2, separators=(',', ': ')))
+            return
         result = await session.read_resource(finalUri)
     except McpError as err:
         error_dict = {
@@ -306,19 +331,30 @@ async def handleResource(session: ClientSession, uri: AnyUrl | str) -> None:
     print(json.dumps(json.loads(result.contents[0].text), indent=2, separators=(',', ': ')))
 
 
-async def handleServerMessagePrompt(message: types.GetPromptResult) -> None:
+async def iterUserPages(session: ClientSession) -> AsyncIterator[List[Dict[str, Any]]]:
+    cursor = 0
+    while cursor is not None:
+        result = await session.read_resource(f"users://page/{cursor}")
+        page = json.loads(result.contents[0].text)
+        users = page["content"][0]["text"]
+        if not isinstance(users, list): #server returned an error message
+            raise McpError(types.ErrorData(code=types.INTERNAL_ERROR, message=users))
+        yield users
+        cursor = page.get("nextCursor")
+
+
+async def handleServerMessagePrompt(message: types.GetPromptResult, confirm: bool = True) -> None:
     if message.content.type != "text": return
     #print(message.content.text)
-    run = [
-        inquirer.Confirm("run", message="Would you like to run the above prompt", default=True),
-    ]
-    runAnswer =inquirer.prompt(run, theme=GreenPassion())['run']
-    if not runAnswer: return
-
-    response = google.models.generate_content(
-        model='models/gemini-2.5-flash',
-        contents=message.content.text
-    )
+    if confirm:
+        loadInquirer()
+        run = [
+            inquirer.Confirm("run", message="Would you like to run the above prompt", default=True),
+        ]
+        runAnswer =inquirer.prompt(run, theme=GreenPassion())['run']
+        if not runAnswer: return
+
+    response = await getLLM().generate(message.content.text)
 
     return response.text
 
@@ -0,0 +1,77 @@
+"""Encoding of the users data files.
+
+orjson (or msgspec) is used for JSON when installed, with the stdlib json module as the fallback.
+Snapshots can be written as minified JSON, the legacy indented JSON, or MessagePack (needs msgspec);
+reading detects the format, so switching formats needs no migration.
+"""
+import json
+from typing import Any, Callable, Union
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+FORMATS = ("json", "json-pretty", "msgpack")
+
+
+def check_format(format: str) -> None:
+    """Fail early for a snapshot format that is unknown or whose library is not installed"""
+    if format not in FORMATS:
+        raise ValueError(f"Unknown data format: {format}")
+    if format == "msgpack" and msgspec is None:
+        raise RuntimeError("The msgpack format needs msgspec (pip install msgspec)")
+
+
+def to_plain(obj: Any) -> Any:
+    """Default encoder hook: records (e.g. store.UserRecord) encode as their to_dict()"""
+    to_dict = getattr(obj, "to_dict", None)
+    if to_dict is None:
+        raise TypeError(f"Object of type {type(obj).__name__} is not serializable")
+    return to_dict()
+
+
+def dumps(obj: Any, default: Callable[[Any], Any] = to_plain) -> bytes:
+    """Minified JSON. `default` converts objects the encoder does not know"""
+    if orjson is not None:
+        return orjson.dumps(obj, default=default)
+    if msgspec is not None:
+        return msgspec.json.encode(obj, enc_hook=default)
+    return json.dumps(obj, default=default, separators=(",", ":")).encode()
+
+
+def loads(data: Union[bytes, str]) -> Any:
+    """Parse JSON. Invalid input raises ValueError whichever library is used"""
+    if orjson is not None:
+        return orjson.loads(data)
+    if msgspec is not None:
+        try:
+            return msgspec.json.decode(data)
+        except msgspec.DecodeError as e:
+            raise ValueError(str(e)) from e
+    return json.loads(data)
+
+
+def encode(obj: Any, format: str = "json", default: Callable[[Any], Any] = to_plain) -> bytes:
+    """Encode a snapshot in one of FORMATS"""
+    check_format(format)
+    if format == "msgpack":
+        return msgspec.msgpack.encode(obj, enc_hook=default)
+    if format == "json-pretty":
+        return json.dumps(obj, default=default, indent=4).encode()
+    return dumps(obj, default=default)
+
+
+def decode(data: bytes) -> Any:
+    """Decode a snapshot written in any of FORMATS"""
+    # A JSON document starts with whitespace, '[' or '{'; none of those is a MessagePack array or map header
+    if data[:1] in (b"[", b"{", b" ", b"\t", b"\r", b"\n", b""):
+        return loads(data)
+    if msgspec is None:
+        raise RuntimeError("Reading a msgpack snapshot needs msgspec (pip install msgspec)")
+    return msgspec.msgpack.decode(data)
@@ -0,0 +1,101 @@
+from typing import Any, Dict, List, Optional, Tuple
+import mcp.types as types
+from google.genai import types as genai_types
+
+# JSON schema keywords Gemini's Schema understands, passed through as-is
+PASSTHROUGH_KEYS = (
+    "description", "enum", "format", "pattern", "minimum", "maximum",
+    "minItems", "maxItems", "minLength", "maxLength", "minProperties", "maxProperties",
+)
+
+
+def toGeminiSchema(schema: Dict[str, Any], defs: Dict[str, Any], seen: Tuple[str, ...] = ()) -> Dict[str, Any]:
+    """Translate a JSON schema (as emitted by pydantic) into the subset Gemini accepts.
+
+    `$ref`s are inlined from `defs` (plus any `$defs` nested in the schema) at any depth, and `anyOf`/type
+    lists containing "null" become `nullable`.
+    """
+    if "$defs" in schema:
+        defs = {**defs, **schema["$defs"]}
+    if "$ref" in schema:
+        name = schema["$ref"].split("/")[-1]
+        if name in seen: # recursive model: stop expanding
+            return {"type": "object"}
+        extra = {k: v for k, v in schema.items() if k != "$ref"}
+        return toGeminiSchema({**defs[name], **extra}, defs, seen + (name,))
+
+    variants = schema.get("anyOf") or schema.get("oneOf")
+    if variants:
+        non_null = [v for v in variants if v.get("type") != "null"]
+        if len(non_null) == 1:
+            result = toGeminiSchema(non_null[0], defs, seen)
+        else:
+            result = {"anyOf": [toGeminiSchema(v, defs, seen) for v in non_null]}
+        if len(non_null) < len(variants):
+            result["nullable"] = True
+        if "description" in schema:
+            result["description"] = schema["description"]
+        return result
+
+    result: Dict[str, Any] = {}
+    schema_type = schema.get("type")
+    if isinstance(schema_type, list):
+        non_null_types = [t for t in schema_type if t != "null"]
+        if len(non_null_types) < len(schema_type):
+            result["nullable"] = True
+        schema_type = non_null_types[0] if len(non_null_types) == 1 else None
+        if schema_type is None and non_null_types:
+            result["anyOf"] = [{"type": t} for t in non_null_types]
+    if schema_type:
+        result["type"] = schema_type
+    elif "properties" in schema:
+        result["type"] = "object"
+
+    for key in PASSTHROUGH_KEYS:
+        if key in schema:
+            result[key] = schema[key]
+    if "properties" in schema:
+        result["properties"] = {name: toGeminiSchema(prop, defs, seen) for name, prop in schema["properties"].items()}
+        if schema.get("required"):
+            result["required"] = list(schema["required"])
+    if "items" in schema:
+        result["items"] = toGeminiSchema(schema["items"], defs, seen)
+    return result
+
+
+def toFunctionDeclaration(tool: types.Tool) -> genai_types.FunctionDeclaration:
+    inputSchema = tool.inputSchema or {}
+    parameters: Optional[Dict[str, Any]] = None
+    if inputSchema.get("properties"): # Gemini rejects an object schema without properties
+        parameters = toGeminiSchema(inputSchema, inputSchema.get("$defs", {}))
+    return genai_types.FunctionDeclaration(
+        name=tool.name,
+        description=tool.description or "",
+        parameters=genai_types.Schema.model_validate(parameters) if parameters else None,
+    )
+
+
+def toGeminiTools(tools: List[types.Tool]) -> List[genai_types.Tool]:
+    if not tools:
+        return []
+    return [genai_types.Tool(function_declarations=[toFunctionDeclaration(tool) for tool in tools])]
+
+
+class ToolDeclarationCache:
+    """Gemini tool declarations for one `list_tools` result, translated once and reused for every query.
+
+    `invalidate()` is called on `notifications/tools/list_changed`.
+    """
+
+    def __init__(self):
+        self._source: Optional[List[types.Tool]] = None
+        self._declarations: List[genai_types.Tool] = []
+
+    def get(self, tools: List[types.Tool]) -> List[genai_types.Tool]:
+        if tools is not self._source:
+            self._declarations = toGeminiTools(tools)
+            self._source = tools
+        return self._declarations
+
+    def invalidate(self) -> None:
+        self._source = None
@@ -0,0 +1,139 @@
+"""Import-time benchmark for the server and client entry points.
+
+Every module is imported in a fresh interpreter with `python -X importtime`, several times (after one untimed
+run that writes the bytecode caches). Reported per module: the median wall time of the whole interpreter run,
+the module's cumulative import time, and its slowest direct imports. With --connect it also measures what every
+spawned session pays: the time from starting `server.py` on stdio to its initialize response.
+
+Usage:
+
+    uv run src/importtime.py
+    uv run src/importtime.py --modules server client batch --runs 10 --top 5 --connect
+
+USERS_* variables configure the spawned server, as for the batch runner. Importing the server loads (and locks)
+its store, so every run uses a private copy of the data instead of USERS_DATA_PATH itself.
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+from stats import percentile
+
+SRC_DIR = Path(__file__).resolve().parent
+DEFAULT_DATA = SRC_DIR.parent / "data" / "users.json"
+
+
+def privateDataEnv(workdir: Path) -> Dict[str, str]:
+    """Copy the server's data into `workdir` and return the USERS_* variables that point the server at the copy"""
+    source = Path(os.getenv("USERS_DATA_PATH", str(DEFAULT_DATA)))
+    if source.exists():
+        shutil.copy(source, workdir / "users.json")
+    return {"USERS_DATA_PATH": str(workdir / "users.json"), "USERS_DB_PATH": str(workdir / "users.db")}
+
+
+def parseImportTime(stderr: str) -> List[Tuple[int, str, int, int]]:
+    """(depth, module, self us, cumulative us) for every line `-X importtime` printed"""
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        entries.append((depth, name.strip(), int(self_us), int(cumulative_us)))
+    return entries
+
+
+def importOnce(module: str, env: Dict[str, str]) -> Tuple[float, int, Dict[str, int]]:
+    """Wall seconds, cumulative import us of `module`, and cumulative us of each of its direct imports"""
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=SRC_DIR, env={**os.environ, **env, "PYTHONPATH": str(SRC_DIR)}, capture_output=True, text=True,
+    )
+    wall = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr[-2000:]}")
+
+    entries = parseImportTime(proc.stderr)
+    total, children = 0, {}
+    # -X importtime prints a module after its imports, so walk backwards from the module's own line
+    for index in range(len(entries) - 1, -1, -1):
+        depth, name, _, cumulative = entries[index]
+        if depth == 0 and name == module:
+            total = cumulative
+            for child_depth, child, _, child_cumulative in reversed(entries[:index]):
+                if child_depth == 0:
+                    break
+                if child_depth == 1:
+                    children[child] = child_cumulative
+            break
+    return wall, total, children
+
+
+def measureImports(module: str, runs: int, env: Dict[str, str]) -> Dict[str, Any]:
+    importOnce(module, env)  # compile and cache bytecode
+    walls, totals, children = [], [], {}
+    for _ in range(runs):
+        wall, total, direct = importOnce(module, env)
+        walls.append(wall)
+        totals.append(total)
+        for name, cumulative in direct.items():
+            children.setdefault(name, []).append(cumulative)
+    return {
+        "wall_ms": round(statistics.median(walls) * 1000, 1),
+        "import_ms": round(statistics.median(totals) / 1000, 1),
+        "imports_ms": {name: round(statistics.median(values) / 1000, 1) for name, values in children.items()},
+    }
+
+
+async def measureConnect(runs: int, data_env: Dict[str, str]) -> Dict[str, Any]:
+    from batch import serverEnv
+    from session_pool import SessionPool
+
+    env = {**serverEnv(), **data_env}
+    latencies = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        async with SessionPool(command=[sys.executable, str(SRC_DIR / "server.py")], env=env):
+            latencies.append(time.perf_counter() - start)
+    ordered = sorted(latencies)
+    return {"p50_ms": round(percentile(ordered, 50) * 1000, 1), "max_ms": round(ordered[-1] * 1000, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure import time and cold start of the server and client")
+    parser.add_argument("--modules", nargs="+", default=["server", "client"], help="modules under src/ to import")
+    parser.add_argument("--runs", type=int, default=5, help="timed runs per module")
+    parser.add_argument("--top", type=int, default=5, help="slowest direct imports to list per module")
+    parser.add_argument("--connect", action="store_true", help="also time spawning server.py up to initialize")
+    args = parser.parse_args()
+
+    workdir = Path(tempfile.mkdtemp(prefix="mcp-importtime-"))
+    try:
+        env = privateDataEnv(workdir)
+        baseline = measureImports("os", args.runs, env)["wall_ms"]
+        print(f"interpreter startup: {baseline}ms")
+        for module in args.modules:
+            result = measureImports(module, args.runs, env)
+            print(f"{module}: {result['wall_ms']}ms wall, {result['import_ms']}ms importing")
+            slowest = sorted(result["imports_ms"].items(), key=lambda item: item[1], reverse=True)[:args.top]
+            for name, ms in slowest:
+                print(f"  {name}: {ms}ms")
+
+        if args.connect:
+            result = asyncio.run(measureConnect(args.runs, env))
+            print(f"spawn server.py to initialize: p50 {result['p50_ms']}ms, max {result['max_ms']}ms")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
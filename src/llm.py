@@ -0,0 +1,218 @@
+import asyncio
+import importlib
+import json
+import os
+import random
+import re
+from typing import Any, Callable, Dict, Optional, Protocol, Union
+import httpx
+from google import genai
+from google.genai import errors as genai_errors
+from google.genai import types as genai_types
+
+try:
+    import aiohttp  # the SDK's async client uses it instead of httpx when it is installed
+except ImportError:
+    aiohttp = None
+
+DEFAULT_MODEL = 'models/gemini-2.5-flash'
+
+# HTTP statuses worth retrying: rate limited, or the service is having a bad moment
+RETRYABLE_CODES = {408, 429, 500, 502, 503, 504}
+# Connection failures and network timeouts; none of them derive from ConnectionError
+NETWORK_ERRORS = (httpx.TransportError,) + ((aiohttp.ClientError,) if aiohttp is not None else ())
+
+
+class Provider(Protocol):
+    """What LLM needs from a model backend. Select one with LLM_PROVIDER (see PROVIDERS)"""
+
+    async def generate(self, model: str, contents: Any, config: Optional[genai_types.GenerateContentConfig] = None) -> genai_types.GenerateContentResponse:
+        ...
+
+
+class GeminiProvider:
+    """Gemini through the SDK's async client. One client (and its HTTP connection pool) is reused for every call"""
+
+    def __init__(self, api_key: Optional[str] = None):
+        self.api_key = api_key
+        self._client: Optional[genai.Client] = None
+
+    @property
+    def client(self) -> genai.Client:
+        if self._client is None:
+            self._client = genai.Client(api_key=self.api_key or os.getenv('GEMINI_API_KEY'))
+        return self._client
+
+    async def generate(self, model: str, contents: Any, config: Optional[genai_types.GenerateContentConfig] = None) -> genai_types.GenerateContentResponse:
+        return await self.client.aio.models.generate_content(model=model, contents=contents, config=config)
+
+
+class FakeProvider:
+    """Local, deterministic stand-in for Gemini, so the client can be exercised and load tested without network access.
+
+    `reply` maps the request contents to either reply text or a full GenerateContentResponse; by default
+    `FakeReplies` is used. Every call takes `latency` seconds plus up to `jitter` more, drawn from a generator
+    seeded with `seed`. The first `failures` calls raise `error()`, by default a retryable 503.
+    """
+
+    def __init__(
+        self,
+        reply: Optional[Callable[[Any], Union[str, genai_types.GenerateContentResponse]]] = None,
+        failures: int = 0,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        seed: int = 0,
+        error: Optional[Callable[[], Exception]] = None,
+    ):
+        self.reply = reply or FakeReplies(seed)
+        self.failures = failures
+        self.error = error or (lambda: genai_errors.ServerError(503, {"error": {"message": "fake outage", "status": "UNAVAILABLE"}}))
+        self.latency = latency
+        self.jitter = jitter
+        self.calls = 0
+        self._random = random.Random(seed)
+
+    async def generate(self, model: str, contents: Any, config: Optional[genai_types.GenerateContentConfig] = None) -> genai_types.GenerateContentResponse:
+        self.calls += 1
+        await asyncio.sleep(self.latency + self._random.uniform(0, self.jitter))
+        if self.calls <= self.failures:
+            raise self.error()
+        reply = self.reply(contents)
+        if isinstance(reply, genai_types.GenerateContentResponse):
+            return reply
+        return textResponse(reply)
+
+
+class FakeReplies:
+    """Default FakeProvider replies.
+
+    - A prompt asking for N fake users (the server's user pool refill) gets a JSON array of N users
+      with unique, deterministic emails.
+    - With `tool`, a tool-enabled conversation (a list of contents) first gets a call to that tool with
+      `tool_args`, then, once the tool result is in, a text answer. This drives the client's query loop.
+    - Anything else gets "ok".
+    """
+
+    def __init__(self, seed: int = 0, tool: Optional[str] = None, tool_args: Optional[Dict[str, Any]] = None):
+        self.seed = seed
+        self.tool = tool
+        self.tool_args = tool_args or {}
+        self.users = 0
+
+    def __call__(self, contents: Any) -> Union[str, genai_types.GenerateContentResponse]:
+        if isinstance(contents, list):
+            parts = getattr(contents[-1], "parts", None) or []
+            if any(part.function_response for part in parts):
+                return "Done: " + json.dumps([part.function_response.response for part in parts if part.function_response])
+            if self.tool:
+                return functionCallResponse(self.tool, self.tool_args)
+            return "ok"
+
+        match = re.search(r"Generate (\d+) different fake users", str(contents))
+        if match:
+            return json.dumps([self.user() for _ in range(int(match.group(1)))])
+        if "Generate a fake user" in str(contents):
+            return json.dumps(self.user())
+        return "ok"
+
+    def user(self) -> Dict[str, Any]:
+        self.users += 1
+        return {
+            "name": f"Fake User {self.users}",
+            "email": f"fake-{self.seed}-{self.users}@example.com",
+            "address": f"{self.users} Main St, Springfield, IL",
+            "phone": f"555-{self.users % 10000:04d}",
+        }
+
+
+def textResponse(text: str) -> genai_types.GenerateContentResponse:
+    return genai_types.GenerateContentResponse(
+        candidates=[genai_types.Candidate(content=genai_types.Content(role="model", parts=[genai_types.Part(text=text)]))]
+    )
+
+
+def functionCallResponse(name: str, args: Dict[str, Any]) -> genai_types.GenerateContentResponse:
+    return genai_types.GenerateContentResponse(
+        candidates=[genai_types.Candidate(content=genai_types.Content(
+            role="model", parts=[genai_types.Part(function_call=genai_types.FunctionCall(name=name, args=args))]
+        ))]
+    )
+
+
+def isRetryable(err: Exception) -> bool:
+    if isinstance(err, genai_errors.APIError):
+        return err.code in RETRYABLE_CODES
+    return isinstance(err, (asyncio.TimeoutError, ConnectionError) + NETWORK_ERRORS)
+
+
+class LLM:
+    """Non-blocking model calls with a per-attempt timeout, retries with exponential backoff and a concurrency limit"""
+
+    def __init__(
+        self,
+        provider: Provider,
+        model: str = DEFAULT_MODEL,
+        timeout: float = 60.0,
+        retries: int = 3,
+        backoff: float = 0.5,
+        concurrency: int = 4,
+    ):
+        self.provider = provider
+        self.model = model
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+    async def generate(self, contents: Any, config: Optional[genai_types.GenerateContentConfig] = None) -> genai_types.GenerateContentResponse:
+        async with self._semaphore:
+            for attempt in range(self.retries + 1):
+                try:
+                    return await asyncio.wait_for(self.provider.generate(self.model, contents, config), self.timeout)
+                except Exception as err:
+                    if attempt == self.retries or not isRetryable(err):
+                        raise
+                    # Full jitter, so parallel callers do not retry in lockstep
+                    await asyncio.sleep(random.uniform(0, self.backoff * 2 ** attempt))
+
+
+def fakeProvider() -> FakeProvider:
+    """FakeProvider configured from LLM_FAKE_* environment variables"""
+    seed = int(os.getenv('LLM_FAKE_SEED', '0'))
+    return FakeProvider(
+        reply=FakeReplies(
+            seed,
+            tool=os.getenv('LLM_FAKE_TOOL') or None,
+            tool_args=json.loads(os.getenv('LLM_FAKE_TOOL_ARGS', '{}')),
+        ),
+        latency=float(os.getenv('LLM_FAKE_LATENCY', '0')),
+        jitter=float(os.getenv('LLM_FAKE_JITTER', '0')),
+        seed=seed,
+    )
+
+
+# Providers by LLM_PROVIDER name. LLM_PROVIDER can also be "module:factory" for any factory returning a Provider
+PROVIDERS: Dict[str, Callable[[], Provider]] = {
+    'gemini': GeminiProvider,
+    'fake': fakeProvider,
+}
+
+
+def loadProvider(name: str) -> Provider:
+    if name in PROVIDERS:
+        return PROVIDERS[name]()
+    if ":" in name:
+        module, factory = name.split(":", 1)
+        return getattr(importlib.import_module(module), factory)()
+    raise ValueError(f"Unknown LLM_PROVIDER: {name}")
+
+
+def createLLM(provider: Optional[str] = None) -> LLM:
+    """Build the LLM adapter from LLM_* environment variables"""
+    return LLM(
+        loadProvider(provider or os.getenv('LLM_PROVIDER', 'gemini')),
+        model=os.getenv('LLM_MODEL', DEFAULT_MODEL),
+        timeout=float(os.getenv('LLM_TIMEOUT', '60')),
+        retries=int(os.getenv('LLM_RETRIES', '3')),
+        concurrency=int(os.getenv('LLM_CONCURRENCY', '4')),
+    )
@@ -0,0 +1,250 @@
+"""Load generator: N concurrent MCP sessions drive a mix of operations against one server at increasing concurrency.
+
+Sampling requests (the server's fake user pool) and queries are answered by the local fake model provider, so
+the whole loop runs offline. Each level runs closed-loop workers for --duration seconds (after --warmup) and
+reports throughput and p50/p95/p99 latency, overall and per operation. The level where throughput stops growing
+is the saturation point.
+
+By default a streamable HTTP server is started on a private copy of the data; --url attaches to a running one.
+
+Usage:
+
+    uv run src/loadtest.py --sessions 8 --concurrency 1 4 16 64 --duration 10
+    uv run src/loadtest.py --mix create=1,search=4,profile=4,random=1,query=1 --llm-latency 0.2 --llm-jitter 0.1
+
+Operations: create (create_user_tool), search (search_users_tool), profile (users://{userId}/profile),
+page (users://page/0), random (create_random_user_tool, sampling-driven) and query (the client's Gemini
+tool loop). USERS_* variables configure the started server.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+from mcp.client.session import ClientSession
+from batch import makeSamplingCallback, serverEnv
+from gemini_tools import toGeminiTools
+from llm import LLM, FakeProvider, FakeReplies
+from query_engine import QueryEngine
+from session_pool import SessionPool
+from stats import formatSummary, summarize
+
+SRC_DIR = Path(__file__).resolve().parent
+DEFAULT_DATA = SRC_DIR.parent / "data" / "users.json"
+DEFAULT_MIX = "create=1,search=3,profile=4,page=1,random=1,query=1"
+# A level counts as saturated once it adds less than this much throughput over the previous one
+SATURATION_GAIN = 0.1
+
+
+def parseMix(spec: str) -> List[Tuple[str, float]]:
+    mix = []
+    for item in spec.split(","):
+        name, _, weight = item.partition("=")
+        if name not in OPERATIONS:
+            raise ValueError(f"Unknown operation in mix: {name}")
+        mix.append((name, float(weight or 1)))
+    return mix
+
+
+def freePort() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def startServer(workdir: Path, data: Path) -> Tuple[subprocess.Popen, str]:
+    """Start server.py over streamable HTTP on a private copy of `data`, and wait until it accepts connections"""
+    shutil.copy(data, workdir / "users.json")
+    port = freePort()
+    env = {
+        **os.environ,
+        **serverEnv(),
+        "USERS_DATA_PATH": str(workdir / "users.json"),
+        "USERS_DB_PATH": str(workdir / "users.db"),
+    }
+    proc = subprocess.Popen(
+        [sys.executable, str(SRC_DIR / "server.py"), "--transport", "streamable-http", "--port", str(port)],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"server exited with status {proc.returncode}")
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+            return proc, f"http://127.0.0.1:{port}/mcp"
+        except OSError:
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError("server did not start listening within 60s")
+
+
+class Workload:
+    """State shared by the workers: the session pool, the model, and what the operations need to pick arguments"""
+
+    def __init__(self, pool: SessionPool, llm: LLM, tools: List[Any], max_id: int, seed: int):
+        self.pool = pool
+        self.llm = llm
+        self.tools = tools
+        self.max_id = max(max_id, 1)
+        self.run_id = f"{seed}-{os.getpid()}-{time.time_ns()}"
+        self.created = 0
+
+
+def toolFailed(result: Any) -> bool:
+    # The server's tools report most failures as text rather than isError
+    return result.isError or any(getattr(c, "text", "").startswith("Failed") for c in result.content)
+
+
+async def opCreate(session: ClientSession, work: Workload, rnd: random.Random) -> bool:
+    work.created += 1
+    user = {"name": f"Load {work.created}", "email": f"load-{work.run_id}-{work.created}@example.com"}
+    return not toolFailed(await session.call_tool("create_user_tool", {"user": user}))
+
+
+async def opSearch(session: ClientSession, work: Workload, rnd: random.Random) -> bool:
+    return not toolFailed(await session.call_tool("search_users_tool", {"name": rnd.choice("ABCDEFGHIJKLMNOPRSTW")}))
+
+
+async def opProfile(session: ClientSession, work: Workload, rnd: random.Random) -> bool:
+    await session.read_resource(f"users://{rnd.randint(1, work.max_id)}/profile")
+    return True
+
+
+async def opPage(session: ClientSession, work: Workload, rnd: random.Random) -> bool:
+    await session.read_resource("users://page/0")
+    return True
+
+
+async def opRandom(session: ClientSession, work: Workload, rnd: random.Random) -> bool:
+    return not toolFailed(await session.call_tool("create_random_user_tool", {}))
+
+
+async def opQuery(session: ClientSession, work: Workload, rnd: random.Random) -> bool:
+    engine = QueryEngine(session, work.llm, max_steps=4)
+    answer = await engine.run("Find the users whose name starts with A", work.tools)
+    return answer.startswith("Done")
+
+
+OPERATIONS = {
+    "create": opCreate,
+    "search": opSearch,
+    "profile": opProfile,
+    "page": opPage,
+    "random": opRandom,
+    "query": opQuery,
+}
+
+
+async def runLevel(work: Workload, mix: List[Tuple[str, float]], concurrency: int, warmup: float, duration: float, seed: int) -> Dict[str, Any]:
+    """Closed loop at `concurrency`: only operations completing inside the measured window are counted"""
+    names = [name for name, _ in mix]
+    weights = [weight for _, weight in mix]
+    latencies: Dict[str, List[float]] = {name: [] for name in names}
+    errors: Dict[str, int] = {name: 0 for name in names}
+    start = time.perf_counter()
+    measure_from, measure_to = start + warmup, start + warmup + duration
+
+    async def worker(index: int) -> None:
+        rnd = random.Random(seed * 100003 + concurrency * 1009 + index)
+        while (began := time.perf_counter()) < measure_to:
+            name = rnd.choices(names, weights)[0]
+            session = work.pool.session()
+            try:
+                ok = await OPERATIONS[name](session, work, rnd)
+            except Exception:
+                ok = False
+            ended = time.perf_counter()
+            if measure_from <= ended < measure_to:
+                latencies[name].append(ended - began)
+                errors[name] += not ok
+
+    await asyncio.gather(*[worker(i) for i in range(concurrency)])
+    operations = {name: summarize(latencies[name], duration, errors[name]) for name in names if latencies[name]}
+    every = [latency for values in latencies.values() for latency in values]
+    return {"concurrency": concurrency, "overall": summarize(every, duration, sum(errors.values())), "operations": operations}
+
+
+def saturation(levels: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """The first level after which more concurrency adds less than SATURATION_GAIN throughput"""
+    for previous, level in zip(levels, levels[1:]):
+        if level["overall"]["ops_per_s"] < previous["overall"]["ops_per_s"] * (1 + SATURATION_GAIN):
+            return previous
+    return levels[-1]
+
+
+async def runLoadTest(args: argparse.Namespace, url: str) -> Dict[str, Any]:
+    mix = parseMix(args.mix)
+    # One deterministic fake model answers the sampling requests of every session and drives the queries
+    provider = FakeProvider(
+        reply=FakeReplies(args.seed, tool="search_users_tool", tool_args={"name": "A"}),
+        latency=args.llm_latency,
+        jitter=args.llm_jitter,
+        seed=args.seed,
+    )
+    llm = LLM(provider, model="fake", retries=0, concurrency=args.llm_concurrency)
+
+    async with SessionPool(url=url, size=args.sessions, sampling_callback=makeSamplingCallback(llm)) as pool:
+        discovery = await pool.discover(refresh=True)
+        everything = json.loads((await pool.session().read_resource("users://all")).contents[0].text)
+        work = Workload(pool, llm, toGeminiTools(discovery.tools.tools), everything.get("version", 1), args.seed)
+
+        levels = []
+        for concurrency in args.concurrency:
+            level = await runLevel(work, mix, concurrency, args.warmup, args.duration, args.seed)
+            levels.append(level)
+            print(formatSummary(f"concurrency {concurrency}", level["overall"]))
+            for name, summary in level["operations"].items():
+                print("  " + formatSummary(name, summary))
+    return {"levels": levels, "saturation": saturation(levels), "llm_calls": provider.calls}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the MCP server with concurrent sessions and a fake model")
+    parser.add_argument("--url", help="attach to a running server instead of starting one")
+    parser.add_argument("--data", default=str(DEFAULT_DATA), help="users.json to copy for the started server")
+    parser.add_argument("--sessions", type=int, default=4, help="concurrent MCP sessions")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64], help="operations in flight, one level each")
+    parser.add_argument("--duration", type=float, default=10.0, help="measured seconds per level")
+    parser.add_argument("--warmup", type=float, default=1.0, help="unmeasured seconds before each level")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="operation weights, e.g. " + DEFAULT_MIX)
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="seconds per fake model call")
+    parser.add_argument("--llm-jitter", type=float, default=0.0, help="extra random seconds per fake model call")
+    parser.add_argument("--llm-concurrency", type=int, default=64, help="fake model calls in flight")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save", help="write the results as JSON")
+    args = parser.parse_args()
+
+    server = None
+    workdir = Path(tempfile.mkdtemp(prefix="mcp-loadtest-"))
+    try:
+        url = args.url
+        if url is None:
+            server, url = startServer(workdir, Path(args.data))
+        results = asyncio.run(runLoadTest(args, url))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=10)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    peak = results["saturation"]
+    print(
+        f"saturation: {peak['overall']['ops_per_s']} ops/s at concurrency {peak['concurrency']} "
+        f"(p95 {peak['overall']['p95_ms']}ms, p99 {peak['overall']['p99_ms']}ms); {results['llm_calls']} fake model calls"
+    )
+    if args.save:
+        Path(args.save).write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
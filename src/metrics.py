@@ -0,0 +1,164 @@
+import bisect
+import functools
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+# Latency bucket upper bounds in seconds (100us .. 10s); anything slower lands in the +Inf bucket
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """Fixed-bucket histogram: observing is one bisect and three increments"""
+
+    __slots__ = ("bounds", "counts", "count", "sum")
+
+    def __init__(self, bounds: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect.bisect_left(self.bounds, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th observation (the last finite bound for the +Inf bucket)"""
+        if not self.count:
+            return 0.0
+        rank, seen = q * self.count, 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return self.bounds[-1]
+
+    def toJson(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "sum_ms": round(self.sum * 1000, 3),
+            "mean_ms": round(self.sum / self.count * 1000, 3) if self.count else 0.0,
+            "p50_ms_le": round(self.quantile(0.50) * 1000, 3),
+            "p95_ms_le": round(self.quantile(0.95) * 1000, 3),
+            "p99_ms_le": round(self.quantile(0.99) * 1000, 3),
+            # Non-cumulative counts of the non-empty buckets, keyed by upper bound
+            "buckets_ms": {
+                label: count
+                for label, count in zip([f"{bound * 1000:g}" for bound in self.bounds] + ["+Inf"], self.counts)
+                if count
+            },
+        }
+
+
+class HandlerStats:
+    __slots__ = ("calls", "errors", "latency")
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.latency = Histogram()
+
+
+class Metrics:
+    """In-process metrics for the server: per-handler calls, errors and latency, plus named histograms and counters.
+
+    Counters that other components already keep (e.g. storage bytes) are registered as callables and read when
+    a snapshot is taken, so the hot path never pays for them. With `enabled=False`, `instrument` returns
+    handlers unchanged.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.started = time.time()
+        self.handlers: Dict[str, HandlerStats] = {}
+        self.histograms: Dict[str, Histogram] = {}
+        self.counters: Dict[str, Tuple[str, Callable[[], float]]] = {}
+
+    def instrument(self, fn: Callable[..., Any]) -> Callable[..., Any]:
+        """Decorate an async handler (below the @server.* decorator) to record its calls, errors and latency.
+
+        Exceptions count as errors here; handlers that turn failures into a result report them with error()
+        """
+        if not self.enabled:
+            return fn
+        stats = self.handlers.setdefault(fn.__name__, HandlerStats())
+        perf_counter = time.perf_counter
+
+        # functools.wraps keeps the signature and annotations FastMCP builds the handler's schema from
+        @functools.wraps(fn)
+        async def wrapper(*args: Any, **kwargs: Any) -> Any:
+            start = perf_counter()
+            try:
+                return await fn(*args, **kwargs)
+            except BaseException:
+                stats.errors += 1
+                raise
+            finally:
+                stats.calls += 1
+                stats.latency.observe(perf_counter() - start)
+
+        return wrapper
+
+    def error(self, handler: str) -> None:
+        """Count a failure that `handler` caught and reported in its result instead of raising"""
+        if self.enabled:
+            self.handlers.setdefault(handler, HandlerStats()).errors += 1
+
+    def histogram(self, name: str) -> Histogram:
+        return self.histograms.setdefault(name, Histogram())
+
+    def observe(self, name: str, seconds: float) -> None:
+        if self.enabled:
+            self.histogram(name).observe(seconds)
+
+    def register_counter(self, name: str, help: str, read: Callable[[], float]) -> None:
+        self.counters[name] = (help, read)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "uptime_s": round(time.time() - self.started, 3),
+            "handlers": {
+                name: {"calls": stats.calls, "errors": stats.errors, "latency": stats.latency.toJson()}
+                for name, stats in self.handlers.items()
+            },
+            "histograms": {name: histogram.toJson() for name, histogram in self.histograms.items()},
+            "counters": {name: read() for name, (_, read) in self.counters.items()},
+        }
+
+    def prometheus(self, prefix: str = "mcp") -> str:
+        """Prometheus text exposition format (version 0.0.4)"""
+        lines: List[str] = []
+
+        lines += [f"# HELP {prefix}_handler_calls_total Handler invocations", f"# TYPE {prefix}_handler_calls_total counter"]
+        lines += [f'{prefix}_handler_calls_total{{handler="{name}"}} {s.calls}' for name, s in self.handlers.items()]
+        lines += [f"# HELP {prefix}_handler_errors_total Handler invocations that failed", f"# TYPE {prefix}_handler_errors_total counter"]
+        lines += [f'{prefix}_handler_errors_total{{handler="{name}"}} {s.errors}' for name, s in self.handlers.items()]
+
+        metric = f"{prefix}_handler_latency_seconds"
+        lines += [f"# HELP {metric} Handler latency", f"# TYPE {metric} histogram"]
+        for name, stats in self.handlers.items():
+            lines += histogramLines(metric, f'handler="{name}"', stats.latency)
+
+        for name, histogram in self.histograms.items():
+            metric = f"{prefix}_{name}_seconds"
+            lines += [f"# TYPE {metric} histogram"] + histogramLines(metric, "", histogram)
+
+        for name, (help, read) in self.counters.items():
+            metric = f"{prefix}_{name}_total"
+            lines += [f"# HELP {metric} {help}", f"# TYPE {metric} counter", f"{metric} {read()}"]
+        return "\n".join(lines) + "\n"
+
+
+def histogramLines(metric: str, labels: str, histogram: Histogram) -> List[str]:
+    sep = "," if labels else ""
+    lines, cumulative = [], 0
+    for bound, count in zip(histogram.bounds, histogram.counts):
+        cumulative += count
+        lines.append(f'{metric}_bucket{{{labels}{sep}le="{bound}"}} {cumulative}')
+    lines.append(f'{metric}_bucket{{{labels}{sep}le="+Inf"}} {histogram.count}')
+    suffix = f"{{{labels}}}" if labels else ""
+    lines.append(f"{metric}_sum{suffix} {histogram.sum}")
+    lines.append(f"{metric}_count{suffix} {histogram.count}")
+    return lines
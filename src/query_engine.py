@@ -0,0 +1,61 @@
+import asyncio
+from typing import Any, Callable, Dict, List, Optional
+from mcp.client.session import ClientSession
+from google.genai import types as genai_types
+from llm import LLM
+
+
+class QueryEngine:
+    """Agentic tool loop: the model's function calls are run concurrently against the MCP session and their
+    results fed back, until the model answers in text or the step/time budget runs out.
+    """
+
+    def __init__(
+        self,
+        session: ClientSession,
+        llm: LLM,
+        max_steps: int = 8,
+        timeout: float = 120.0,
+        on_tool_result: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+    ):
+        self.session = session
+        self.llm = llm
+        self.max_steps = max_steps
+        self.timeout = timeout
+        self.on_tool_result = on_tool_result
+
+    async def run(self, prompt: str, tools: List[genai_types.Tool]) -> str:
+        return await asyncio.wait_for(self._loop(prompt, tools), self.timeout)
+
+    async def _loop(self, prompt: str, tools: List[genai_types.Tool]) -> str:
+        config = genai_types.GenerateContentConfig(tools=tools)
+        contents: List[genai_types.Content] = [
+            genai_types.Content(role="user", parts=[genai_types.Part(text=prompt)])
+        ]
+        for _ in range(self.max_steps):
+            response = await self.llm.generate(contents, config=config)
+            function_calls = response.function_calls
+            if not function_calls:
+                return response.text or ""
+
+            contents.append(response.candidates[0].content)
+            results = await asyncio.gather(*[self._call_tool(call) for call in function_calls])
+            contents.append(genai_types.Content(
+                role="user",
+                parts=[
+                    genai_types.Part.from_function_response(name=call.name, response=result)
+                    for call, result in zip(function_calls, results)
+                ],
+            ))
+        return f"Stopped after {self.max_steps} steps without a final answer"
+
+    async def _call_tool(self, call: genai_types.FunctionCall) -> Dict[str, Any]:
+        try:
+            result = await self.session.call_tool(call.name, arguments=dict(call.args or {}))
+            text = "\n".join(c.text for c in result.content if getattr(c, "text", None))
+            response = {"error": text} if result.isError else {"result": text}
+        except Exception as e:
+            response = {"error": str(e)}
+        if self.on_tool_result:
+            self.on_tool_result(call.name, response)
+        return response
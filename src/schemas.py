@@ -0,0 +1,9 @@
+from typing import Optional
+from pydantic import BaseModel
+
+
+class UserSchema(BaseModel):
+    name: str
+    email: str
+    address: Optional[str] = None
+    phone: Optional[str] = None
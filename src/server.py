@@ -1,23 +1,74 @@
+import argparse
 import asyncio
-from typing import Any, Dict, Optional
-import json
-import re
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
 from pathlib import Path
-from pydantic import BaseModel
+from pydantic import AnyUrl
 import mcp.types as types
 from mcp.server.fastmcp import Context, FastMCP
 from mcp.server.session import ServerSession
+from metrics import Metrics
+from schemas import UserSchema
+from storage import JournalStorage
+from store import BaseUserStore, DuplicateEmailError, UserStore
+from subscriptions import Subscriptions
+from user_pool import UserPool
 
 server = FastMCP(name="test_video",instructions="mcp server for user CRUD operations")
 
-DATA_PATH = f"{Path(__file__).resolve().parent.parent}/data/users.json"
-
-################################ SCHEMAS ################################
-class UserSchema(BaseModel):
-    name: str
-    email: str
-    address: Optional[str] = None
-    phone: Optional[str] = None
+# Advertised in serverInfo; clients key their cached discovery results on it, so it changes with every
+# module that defines handlers or their schemas
+DISCOVERY_SOURCES = [Path(__file__), Path(__file__).with_name("schemas.py")]
+SERVER_VERSION = f"0.1.0+{hashlib.sha256(b''.join(p.read_bytes() for p in DISCOVERY_SOURCES)).hexdigest()[:12]}"
+server._mcp_server.version = SERVER_VERSION # FastMCP 1.18 has no version argument
+
+DATA_PATH = os.getenv("USERS_DATA_PATH", f"{Path(__file__).resolve().parent.parent}/data/users.json")
+
+# Storage backend: "json" (in-memory table over users.json + journal) or "sqlite"
+STORAGE_BACKEND = os.getenv("USERS_STORAGE", "json")
+DB_PATH = os.getenv("USERS_DB_PATH", str(Path(DATA_PATH).with_suffix(".db")))
+COMPACT_EVERY = int(os.getenv("USERS_COMPACT_EVERY", "1000"))
+# Snapshot format written by the JSON backend: "json" (minified), "json-pretty" (indented) or "msgpack"
+DATA_FORMAT = os.getenv("USERS_DATA_FORMAT", "json")
+
+# Storage I/O (and optionally JSON encoding) runs on a bounded pool instead of the event loop
+IO_WORKERS = int(os.getenv("USERS_IO_WORKERS", "4"))
+OFFLOAD_JSON = os.getenv("USERS_OFFLOAD_JSON", "0") == "1"
+PAGE_SIZE = int(os.getenv("USERS_PAGE_SIZE", "100"))
+
+# Fake users for create_random_user_tool, sampled in batches ahead of time
+POOL_BATCH_SIZE = int(os.getenv("USERS_POOL_BATCH_SIZE", "20"))
+POOL_LOW_WATER = int(os.getenv("USERS_POOL_LOW_WATER", "5"))
+# Unset: a different offline sequence per process. A fixed seed is reproducible but repeats across restarts
+POOL_SEED = int(os.environ["USERS_POOL_SEED"]) if os.getenv("USERS_POOL_SEED") else None
+
+# Per-handler call counts, errors and latency histograms, served as metrics://server
+METRICS_ENABLED = os.getenv("USERS_METRICS", "1") == "1"
+
+
+def createStore() -> BaseUserStore:
+    executor = ThreadPoolExecutor(max_workers=IO_WORKERS, thread_name_prefix="users-io")
+    if STORAGE_BACKEND == "sqlite":
+        from sqlite_store import SqliteUserStore
+        return SqliteUserStore(DB_PATH, executor=executor, pool_size=IO_WORKERS, offload_json=OFFLOAD_JSON, seed_path=DATA_PATH)
+    if STORAGE_BACKEND != "json":
+        raise ValueError(f"Unknown USERS_STORAGE backend: {STORAGE_BACKEND}")
+    return UserStore(JournalStorage(DATA_PATH, compact_every=COMPACT_EVERY, format=DATA_FORMAT), executor=executor, offload_json=OFFLOAD_JSON)
+
+
+metrics = Metrics(enabled=METRICS_ENABLED)
+store = createStore()
+userPool = UserPool(
+    batch_size=POOL_BATCH_SIZE,
+    low_water=POOL_LOW_WATER,
+    seed=POOL_SEED,
+    on_sample=lambda seconds: metrics.observe("sampling_rtt", seconds),
+)
+metrics.register_counter("storage_bytes_read", "Bytes read by the storage layer", lambda: store.io_stats()["bytes_read"])
+metrics.register_counter("storage_bytes_written", "Bytes written by the storage layer", lambda: store.io_stats()["bytes_written"])
+subscriptions = Subscriptions()
 
 ################################ TOOL, RESOURCES, PROMPTS ################################
 
@@ -27,41 +78,76 @@ class UserSchema(BaseModel):
     mime_type="application/json",
     description="Get all users data from the database"
 )
+@metrics.instrument
 async def get_all_users_resource() -> Dict[str, Any]:
     """Get all users data from the database"""
     try:
-        if not Path(DATA_PATH).exists():
-            return {"content": [{"type": "text", "text": "No users found"}]}
+        # Read the version first: users created meanwhile are then re-sent by users://changes, never missed
+        version = await store.version()
+        if not await store.count():
+            return {"content": [{"type": "text", "text": "No users found"}], "version": version}
+
+        return await store.render({"content": [{"text": await store.all()}], "version": version})
+    except Exception:
+        metrics.error("get_all_users_resource")
+        return {"content": [{"type": "text", "text": "Failed to retrieve users"}]}
 
-        with open(DATA_PATH, 'r') as f:
-            users = json.load(f)
 
-        return {"content": [{"text": users}]}
+@server.resource(
+    uri="users://page/{cursor}",
+    name="Users Page",
+    mime_type="application/json",
+    description="Get one page of users data from the database. Start with cursor 0 and follow nextCursor until it is null"
+)
+@metrics.instrument
+async def get_users_page_resource(cursor: int) -> Dict[str, Any]:
+    """Get one page of users data from the database"""
+    try:
+        users, next_cursor = await store.page(after=cursor, limit=PAGE_SIZE)
+        return await store.render({"content": [{"text": users}], "nextCursor": next_cursor})
     except Exception:
+        metrics.error("get_users_page_resource")
         return {"content": [{"type": "text", "text": "Failed to retrieve users"}]}
 
 
+@server.resource(
+    uri="users://changes/{sinceVersion}",
+    name="User Changes",
+    mime_type="application/json",
+    description=(
+        "Get the users created after a version of the data. Start from the version returned by users://all "
+        "and keep following version while hasMore is true"
+    )
+)
+@metrics.instrument
+async def get_user_changes_resource(sinceVersion: int) -> Dict[str, Any]:
+    """Get the users created after a version of the data"""
+    try:
+        users, next_cursor = await store.page(after=sinceVersion, limit=PAGE_SIZE)
+        version = users[-1]['id'] if users else sinceVersion
+        return await store.render({"content": [{"text": users}], "version": version, "hasMore": next_cursor is not None})
+    except Exception:
+        metrics.error("get_user_changes_resource")
+        return {"content": [{"type": "text", "text": "Failed to retrieve user changes"}]}
+
+
 @server.resource(
     uri="users://{userId}/profile",
     name="User Details",
     mime_type="application/json",
     description="Get a user's details from the database"
 )
+@metrics.instrument
 async def get_user_details_resource(userId: int) -> Dict[str, Any]:
     """Get a user's details from the database"""
     try:
-        if not Path(DATA_PATH).exists():
-            return {"content": [{"type": "text", "text": "User not found"}]}
-
-        with open(DATA_PATH, 'r') as f:
-            users = json.load(f)
-
-        user = next((user for user in users if user['id'] == userId), None)
+        user = await store.get(userId)
         if user is None:
             return {"content": [{"type": "text", "text": "User not found"}]}
 
-        return {"content": [{"text": user}]}
+        return await store.render({"content": [{"text": user}]})
     except Exception:
+        metrics.error("get_user_details_resource")
         return {"content": [{"type": "text", "text": "Failed to retrieve user details"}]}
 
 
@@ -72,97 +158,103 @@ async def get_user_details_resource(userId: int) -> Dict[str, Any]:
     "idempotentHint": False,
     "openWorldHint": True,
 })
+@metrics.instrument
 async def create_user_tool(user: UserSchema) -> Dict[str, Any]:
     """Create a new user in the database and return the if succesful entry or not"""
     try:
         params = user.dict()  # Convert Pydantic model to dictionary
         id = await createUser(params)
         return {"content": [{"type": "text", "text": f"User {id} created successfully"}]}
+    except DuplicateEmailError as e:
+        return {"content": [{"type": "text", "text": f"Failed to save user: {e}"}]}
     except Exception:
+        metrics.error("create_user_tool")
         return {"content": [{"type": "text", "text": "Failed to save user"}]}
 
 
 @server.tool(annotations={
-    "title": "Create Random User",
+    "title": "Create Users",
     "readOnlyHint": False,
     "destructiveHint": False,
     "idempotentHint": False,
     "openWorldHint": True,
 })
-async def create_random_user_tool(ctx: Context[ServerSession, None]) -> Dict[str, Any]:
-    """Create a random user with fake data"""
-    result = await ctx.session.create_message(
-        messages=[
-            types.SamplingMessage(
-                role="user",
-                content=types.TextContent(
-                    type="text",
-                    text=(
-                        "Generate fake user data. The user should have a realistic name, email, address, "
-                        "and phone number. Return this data as a JSON object with no other text or formatter "
-                        "so it can be used with JSON.parse."
-                    ),
-                ),
-            )
-        ],
-        max_tokens=1024,
-    )
-
-    # Normalize content extraction (SDKs can return different shapes)
-    content = getattr(result, "content", None)
-    if isinstance(content, list) and content:
-        content = content[0]
-
-    if content is None and isinstance(result, dict):
-        cont = result.get("content")
-        if isinstance(cont, list) and cont:
-            content = cont[0]
-        else:
-            content = cont
-
-    # Extract text blob
-    text_blob = None
-    if isinstance(content, dict):
-        text_blob = content.get("text")
-    else:
-        text_blob = getattr(content, "text", None)
-
-    if not text_blob or not isinstance(text_blob, str):
-        return {"content": [{"type": "text", "text": "Failed to generate user data"}]}
-
-    raw = text_blob.strip()
-    # Remove possible fenced codeblocks
-    raw = raw.removeprefix("```json").removeprefix("```js").removeprefix("```").removesuffix("```").strip()
-
-    # Find first JSON object in the text
-    m = re.search(r"\{[\s\S]*\}", raw)
-    json_text = m.group(0) if m else raw
-
+@metrics.instrument
+async def create_users_tool(users: List[UserSchema]) -> Dict[str, Any]:
+    """Create several users in the database with a single write and return the result of every entry"""
     try:
-        fake_user = json.loads(json_text)
+        ids = await createUsers([user.model_dump() for user in users])
     except Exception:
-        return {"content": [{"type": "text", "text": "Failed to generate user data"}]}
-
-    params = {
-        "name": fake_user.get("name"),
-        "email": fake_user.get("email"),
-        "address": fake_user.get("address", ""),
-        "phone": fake_user.get("phone", "")
+        metrics.error("create_users_tool")
+        return {"content": [{"type": "text", "text": "Failed to save users"}]}
+
+    results = [
+        {"index": index, "error": str(id)} if isinstance(id, Exception) else {"index": index, "id": id}
+        for index, id in enumerate(ids)
+    ]
+    created = sum(1 for result in results if "id" in result)
+    return {
+        "content": [{"type": "text", "text": f"{created} of {len(users)} users created successfully"}],
+        "results": results
     }
-    #fake_user_pydantic = UserSchema(**params).dict()
 
-    if not params["name"] or not params["email"]:
-        return {"content": [{"type": "text", "text": "Generated user data missing required fields"}]}
 
-    # createUser accepts a dict-like params
-    id = await createUser(params)
-    return {"content": [{"type": "text", "text": f"User {id} created successfully"}]}
+@server.tool(annotations={
+    "title": "Search Users",
+    "readOnlyHint": True,
+    "destructiveHint": False,
+    "idempotentHint": True,
+    "openWorldHint": False,
+})
+@metrics.instrument
+async def search_users_tool(email: Optional[str] = None, name: Optional[str] = None, limit: int = 20) -> Dict[str, Any]:
+    """Search users by exact email (case-insensitive) and/or name prefix. Returns at most `limit` users (1 to the page size)"""
+    if email is None and name is None:
+        return {"content": [{"type": "text", "text": "Provide an email or a name to search for"}]}
+    # A negative limit would mean "no limit" to SQLite, and no limit could return the whole table
+    limit = min(max(limit, 1), PAGE_SIZE)
+    users = await store.search(email=email, name=name, limit=limit)
+    if not users:
+        return {"content": [{"type": "text", "text": "No users found"}]}
+    return {"content": [{"text": users}]}
+
+
+@server.tool(annotations={
+    "title": "Create Random User",
+    "readOnlyHint": False,
+    "destructiveHint": False,
+    "idempotentHint": False,
+    "openWorldHint": True,
+})
+@metrics.instrument
+async def create_random_user_tool(ctx: Context[ServerSession, None]) -> Dict[str, Any]:
+    """Create a random user with fake data"""
+    # Pre-generated users are popped from the pool; a taken email just means trying the next one
+    for _ in range(3):
+        fake_user = await userPool.pop(ctx.session)
+        params = {
+            "name": fake_user.get("name"),
+            "email": fake_user.get("email"),
+            "address": fake_user.get("address", ""),
+            "phone": fake_user.get("phone", "")
+        }
+        if not params["name"] or not params["email"]:
+            return {"content": [{"type": "text", "text": "Generated user data missing required fields"}]}
+
+        try:
+            id = await createUser(params)
+        except DuplicateEmailError:
+            continue
+        return {"content": [{"type": "text", "text": f"User {id} created successfully"}]}
+    metrics.error("create_random_user_tool")
+    return {"content": [{"type": "text", "text": "Failed to generate user data"}]}
 
 
 @server.prompt(
     name="generate-fake-user",
     description="Generate a fake user based on a given name"
 )
+@metrics.instrument
 async def create_user_prompt(name: str) -> types.GetPromptResult:
     """Generate a fake user based on a given name"""
     return types.GetPromptResult(
@@ -176,38 +268,112 @@ async def create_user_prompt(name: str) -> types.GetPromptResult:
     )
 
 
+# The metrics resources themselves are not instrumented, so reading them does not skew what they report
+@server.resource(
+    uri="metrics://server",
+    name="Server Metrics",
+    mime_type="application/json",
+    description="Call counts, errors and latency histograms per handler, sampling round-trip time and storage bytes"
+)
+async def get_server_metrics_resource() -> Dict[str, Any]:
+    """Server metrics as JSON"""
+    return metrics.snapshot()
+
+
+@server.resource(
+    uri="metrics://server/prometheus",
+    name="Server Metrics (Prometheus)",
+    mime_type="text/plain",
+    description="The server metrics in the Prometheus text exposition format"
+)
+async def get_server_metrics_prometheus_resource() -> str:
+    """Server metrics in the Prometheus text format"""
+    return metrics.prometheus()
+
+
+################################ SUBSCRIPTIONS ################################
+@server._mcp_server.subscribe_resource()
+async def subscribe_resource(uri: AnyUrl) -> None:
+    subscriptions.subscribe(str(uri), server._mcp_server.request_context.session)
+
+
+@server._mcp_server.unsubscribe_resource()
+async def unsubscribe_resource(uri: AnyUrl) -> None:
+    subscriptions.unsubscribe(str(uri), server._mcp_server.request_context.session)
+
+
+def getCapabilities(*args: Any, **kwargs: Any) -> types.ServerCapabilities:
+    capabilities = lowLevelCapabilities(*args, **kwargs)
+    if capabilities.resources is not None:
+        capabilities.resources.subscribe = True
+    return capabilities
+
+
+# FastMCP 1.18 always advertises subscribe=False, even with subscription handlers registered
+lowLevelCapabilities = server._mcp_server.get_capabilities
+server._mcp_server.get_capabilities = getCapabilities
+
 ################################ UTILS ################################
 async def createUser(params: Dict[str, Any]) -> int:
     """Create a new user in the database and return the if succesful entry or not"""
     try:
-        if not Path(DATA_PATH).exists():
-            with open(DATA_PATH, 'w') as f:
-                json.dump([], f)
-
-        with open(DATA_PATH, 'r') as f:
-            users = json.load(f)
-
-        new_id = max([user['id'] for user in users], default=0) + 1
-        new_user = {
-            "id": new_id,
-            "name": params["name"],
-            "email": params["email"],
-            "address": params.get("address", ""),
-            "phone": params.get("phone", "")
-        }
-        users.append(new_user)
-
-        with open(DATA_PATH, 'w') as f:
-            json.dump(users, f, indent=4)
-
-        return new_id
+        id = await store.create(params)
     except Exception as e:
         raise e
+    await notifyCreated([id])
+    return id
+
+
+async def createUsers(params_list: List[Dict[str, Any]]) -> List[Any]:
+    """Create several users with one write and return, per entry, its new id or the error that rejected it"""
+    ids = await store.create_many(params_list)
+    await notifyCreated([id for id in ids if not isinstance(id, Exception)])
+    return ids
+
+
+async def notifyCreated(ids: List[int]) -> None:
+    """Tell subscribers of users://all and of the new users' profiles that they changed"""
+    if ids:
+        await subscriptions.notify(["users://all"] + [f"users://{id}/profile" for id in ids])
 
 ################################ RUN SERVER ################################
 
+def httpApp():
+    """Streamable HTTP ASGI app, built per worker process by `main --workers N`"""
+    # Workers do not share session state, so any worker must be able to serve any request
+    server.settings.stateless_http = True
+    return server.streamable_http_app()
+
+
 def main():
-    server.run(transport='stdio')
+    parser = argparse.ArgumentParser(description="MCP server for user CRUD operations")
+    parser.add_argument("--transport", choices=["stdio", "sse", "streamable-http"], default="stdio")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=1, help="worker processes (streamable-http with USERS_STORAGE=sqlite only)")
+    args = parser.parse_args()
+
+    if args.workers > 1:
+        if args.transport != "streamable-http":
+            parser.error("--workers needs --transport streamable-http")
+        if STORAGE_BACKEND != "sqlite":
+            # Each worker holds its own in-memory JSON table; only SQLite coordinates writes across processes
+            parser.error("--workers needs USERS_STORAGE=sqlite")
+        import uvicorn
+        uvicorn.run(
+            "server:httpApp",
+            factory=True,
+            app_dir=str(Path(__file__).resolve().parent),
+            host=args.host,
+            port=args.port,
+            workers=args.workers,
+            log_level=server.settings.log_level.lower(),
+        )
+        return
+
+    server.settings.host = args.host
+    server.settings.port = args.port
+    server.run(transport=args.transport)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
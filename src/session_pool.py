@@ -0,0 +1,173 @@
+import asyncio
+import hashlib
+import itertools
+import json
+import os
+from contextlib import AsyncExitStack, asynccontextmanager
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+import mcp.types as types
+from mcp.client.session import ClientSession
+from mcp.client.stdio import StdioServerParameters, stdio_client
+
+DEFAULT_COMMAND = ["uv", "run", "src/server.py"]
+DEFAULT_CACHE_PATH = Path.home() / ".cache" / "mcp-server-client" / "discovery.json"
+
+LIST_CHANGED = (types.ToolListChangedNotification, types.PromptListChangedNotification, types.ResourceListChangedNotification)
+
+
+class Discovery:
+    """Results of the four discovery calls a client makes after connecting"""
+
+    def __init__(
+        self,
+        tools: types.ListToolsResult,
+        prompts: types.ListPromptsResult,
+        resources: types.ListResourcesResult,
+        resource_templates: types.ListResourceTemplatesResult,
+    ):
+        self.tools = tools
+        self.prompts = prompts
+        self.resources = resources
+        self.resource_templates = resource_templates
+
+    def toJson(self) -> Dict[str, Any]:
+        return {
+            "tools": self.tools.model_dump(mode="json"),
+            "prompts": self.prompts.model_dump(mode="json"),
+            "resources": self.resources.model_dump(mode="json"),
+            "resource_templates": self.resource_templates.model_dump(mode="json"),
+        }
+
+    @classmethod
+    def fromJson(cls, data: Dict[str, Any]) -> "Discovery":
+        return cls(
+            types.ListToolsResult.model_validate(data["tools"]),
+            types.ListPromptsResult.model_validate(data["prompts"]),
+            types.ListResourcesResult.model_validate(data["resources"]),
+            types.ListResourceTemplatesResult.model_validate(data["resource_templates"]),
+        )
+
+
+class SessionPool:
+    """One or more initialized sessions to the same MCP server, plus cached discovery.
+
+    With `url` the pool attaches to an already running server (streamable HTTP, or SSE for URLs ending
+    in /sse); otherwise every session spawns `command` on stdio. Discovery results are cached on disk,
+    keyed by the server's name and version, so reconnecting to an unchanged server skips rediscovery.
+    A list_changed notification drops the cached entry.
+    """
+
+    def __init__(
+        self,
+        url: Optional[str] = None,
+        command: Optional[List[str]] = None,
+        size: int = 1,
+        env: Optional[Dict[str, str]] = None,
+        sampling_callback: Any = None,
+        message_handler: Any = None,
+        cache_path: Optional[Path] = None,
+    ):
+        self.url = url
+        self.command = command or DEFAULT_COMMAND
+        self.size = size
+        self.env = env
+        self.sampling_callback = sampling_callback
+        self.message_handler = message_handler
+        self.cache_path = Path(cache_path or os.getenv("MCP_DISCOVERY_CACHE") or DEFAULT_CACHE_PATH)
+        self.sessions: List[ClientSession] = []
+        self.server_info: Optional[types.Implementation] = None
+        self._stack: Optional[AsyncExitStack] = None
+        self._next = itertools.cycle([])
+        self._discovery: Optional[Discovery] = None
+
+    async def __aenter__(self) -> "SessionPool":
+        self._stack = AsyncExitStack()
+        try:
+            for _ in range(self.size):
+                read, write = await self._stack.enter_async_context(self._transport())
+                self.sessions.append(await self._stack.enter_async_context(ClientSession(
+                    read, write, sampling_callback=self.sampling_callback, message_handler=self._handle_message
+                )))
+            results = await asyncio.gather(*[session.initialize() for session in self.sessions])
+        except BaseException:
+            await self._stack.aclose()
+            raise
+        self.server_info = results[0].serverInfo
+        self._next = itertools.cycle(self.sessions)
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self._stack.aclose()
+        self.sessions = []
+
+    def _transport(self):
+        if self.url is None:
+            return stdio_client(StdioServerParameters(command=self.command[0], args=self.command[1:], env=self.env))
+        if self.url.rstrip("/").endswith("/sse"):
+            from mcp.client.sse import sse_client
+            return sse_client(self.url)
+        from mcp.client.streamable_http import streamablehttp_client
+        return _streamsOnly(streamablehttp_client(self.url))
+
+    def session(self) -> ClientSession:
+        """Next session, round robin"""
+        return next(self._next)
+
+    async def discover(self, refresh: bool = False) -> Discovery:
+        if self._discovery is not None and not refresh:
+            return self._discovery
+
+        key = self._cache_key()
+        cache = self._read_cache()
+        if not refresh and key in cache:
+            self._discovery = Discovery.fromJson(cache[key])
+            return self._discovery
+
+        session = self.sessions[0]
+        tools, prompts, resources, resource_templates = await asyncio.gather(
+            session.list_tools(), session.list_prompts(), session.list_resources(), session.list_resource_templates()
+        )
+        self._discovery = Discovery(tools, prompts, resources, resource_templates)
+        cache[key] = self._discovery.toJson()
+        self._write_cache(cache)
+        return self._discovery
+
+    def invalidate(self) -> None:
+        self._discovery = None
+        cache = self._read_cache()
+        if cache.pop(self._cache_key(), None) is not None:
+            self._write_cache(cache)
+
+    async def _handle_message(self, message: Any) -> None:
+        if isinstance(message, types.ServerNotification) and isinstance(message.root, LIST_CHANGED):
+            self.invalidate()
+        if self.message_handler is not None:
+            await self.message_handler(message)
+
+    def _cache_key(self) -> str:
+        target = self.url or " ".join(self.command)
+        info = f"{target}|{self.server_info.name}|{self.server_info.version}" if self.server_info else target
+        return hashlib.sha256(info.encode()).hexdigest()
+
+    def _read_cache(self) -> Dict[str, Any]:
+        try:
+            return json.loads(self.cache_path.read_text())
+        except (OSError, ValueError):
+            return {}
+
+    def _write_cache(self, cache: Dict[str, Any]) -> None:
+        try:
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.cache_path.with_suffix(".tmp")
+            tmp.write_text(json.dumps(cache))
+            os.replace(tmp, self.cache_path)
+        except OSError:
+            pass # the cache is an optimization only
+
+
+@asynccontextmanager
+async def _streamsOnly(context: Any) -> AsyncIterator[Tuple[Any, Any]]:
+    """streamablehttp_client yields (read, write, get_session_id); the pool only needs the streams"""
+    async with context as (read, write, _):
+        yield read, write
@@ -0,0 +1,187 @@
+import json
+import queue
+import sqlite3
+import threading
+from concurrent.futures import Executor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+from storage import JournalStorage
+from store import BaseUserStore, DuplicateEmailError, build_user, normalize_email
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL COLLATE NOCASE,
+    email TEXT NOT NULL,
+    email_norm TEXT NOT NULL,
+    address TEXT,  -- JSON encoded: sampled users may carry a structured address
+    phone TEXT     -- JSON encoded
+);
+CREATE INDEX IF NOT EXISTS users_email_norm ON users (email_norm);
+CREATE INDEX IF NOT EXISTS users_name ON users (name);
+"""
+
+# Fixed statement texts, so each pooled connection prepares them once and reuses them from its statement cache
+SELECT_COLUMNS = "SELECT id, name, email, address, phone FROM users"
+SQL_COUNT = "SELECT COUNT(*) FROM users"
+SQL_ALL = f"{SELECT_COLUMNS} ORDER BY id"
+SQL_GET = f"{SELECT_COLUMNS} WHERE id = ?"
+SQL_PAGE = f"{SELECT_COLUMNS} WHERE id > ? ORDER BY id LIMIT ?"
+SQL_BY_EMAIL = f"{SELECT_COLUMNS} WHERE email_norm = ? ORDER BY id LIMIT ?"
+SQL_BY_EMAIL_AND_NAME = f"{SELECT_COLUMNS} WHERE email_norm = ? AND name LIKE ? ESCAPE '\\' ORDER BY id LIMIT ?"
+SQL_BY_NAME = f"{SELECT_COLUMNS} WHERE name LIKE ? ESCAPE '\\' ORDER BY name, id LIMIT ?"
+SQL_EMAIL_TAKEN = "SELECT 1 FROM users WHERE email_norm = ? LIMIT 1"
+SQL_MAX_ID = "SELECT COALESCE(MAX(id), 0) FROM users"
+SQL_INSERT = "INSERT INTO users (id, name, email, email_norm, address, phone) VALUES (?, ?, ?, ?, ?, ?)"
+
+
+def like_prefix(prefix: str) -> str:
+    return prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+
+def row_bytes(rows: List[Tuple[Any, ...]]) -> int:
+    """Payload size of rows: text length, 8 bytes per number"""
+    return sum(len(value) if isinstance(value, str) else 8 for row in rows for value in row)
+
+
+def row_to_user(row: Tuple[Any, ...]) -> Dict[str, Any]:
+    return {"id": row[0], "name": row[1], "email": row[2], "address": json.loads(row[3]), "phone": json.loads(row[4])}
+
+
+class SqliteUserStore(BaseUserStore):
+    """Users table in a SQLite database (WAL mode), queried through a small connection pool on the executor.
+
+    If the database is empty on first start it is seeded from `seed_path` (the JSON backend's users.json and journal).
+    SQLite does not report its own I/O, so `io_stats` counts the payload bytes of the rows read and written.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        executor: Optional[Executor] = None,
+        pool_size: int = 4,
+        offload_json: bool = False,
+        seed_path: Optional[str] = None,
+    ):
+        super().__init__(executor=executor, offload_json=offload_json)
+        self.path = Path(path)
+        self._pool: "queue.Queue[sqlite3.Connection]" = queue.Queue()
+        self._io_lock = threading.Lock()  # queries run concurrently on the pool threads
+        self.bytes_read = 0
+        self.bytes_written = 0
+        for _ in range(pool_size):
+            self._pool.put(self._connect())
+
+        with self._connection() as conn:
+            conn.executescript(SCHEMA)
+            if seed_path and Path(seed_path).exists():
+                conn.execute("BEGIN IMMEDIATE")  # several server processes may start at once
+                try:
+                    if conn.execute(SQL_COUNT).fetchone()[0] == 0:
+                        # Snapshot plus journal tail, in case the JSON backend was in use until now
+                        users = JournalStorage(seed_path).load()
+                        conn.executemany(SQL_INSERT, [self._row(user) for user in users])
+                    conn.execute("COMMIT")
+                except BaseException:
+                    conn.execute("ROLLBACK")
+                    raise
+
+    def _connect(self) -> sqlite3.Connection:
+        # Autocommit mode: writes open their own BEGIN IMMEDIATE transaction
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, cached_statements=64)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=5000")
+        return conn
+
+    @contextmanager
+    def _connection(self) -> Iterator[sqlite3.Connection]:
+        conn = self._pool.get()
+        try:
+            yield conn
+        finally:
+            self._pool.put(conn)
+
+    def _query(self, sql: str, *params: Any) -> List[Tuple[Any, ...]]:
+        with self._connection() as conn:
+            rows = conn.execute(sql, params).fetchall()
+        size = row_bytes(rows)
+        with self._io_lock:
+            self.bytes_read += size
+        return rows
+
+    @staticmethod
+    def _row(user: Dict[str, Any]) -> Tuple[Any, ...]:
+        return (
+            user['id'], user['name'], user['email'], normalize_email(user['email']),
+            json.dumps(user.get('address')), json.dumps(user.get('phone'))
+        )
+
+    def io_stats(self) -> Dict[str, int]:
+        return {"bytes_read": self.bytes_read, "bytes_written": self.bytes_written}
+
+    async def count(self) -> int:
+        return (await self._run(self._query, SQL_COUNT))[0][0]
+
+    async def all(self) -> List[Dict[str, Any]]:
+        return [row_to_user(row) for row in await self._run(self._query, SQL_ALL)]
+
+    async def get(self, user_id: int) -> Optional[Dict[str, Any]]:
+        rows = await self._run(self._query, SQL_GET, user_id)
+        return row_to_user(rows[0]) if rows else None
+
+    async def version(self) -> int:
+        return (await self._run(self._query, SQL_MAX_ID))[0][0]
+
+    async def page(self, after: int = 0, limit: int = 100) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        rows = await self._run(self._query, SQL_PAGE, after, limit + 1)
+        users = [row_to_user(row) for row in rows[:limit]]
+        next_cursor = users[-1]['id'] if len(rows) > limit else None
+        return users, next_cursor
+
+    async def search(self, email: Optional[str] = None, name: Optional[str] = None, limit: int = 20) -> List[Dict[str, Any]]:
+        if email is not None and name is not None:
+            rows = await self._run(self._query, SQL_BY_EMAIL_AND_NAME, normalize_email(email), like_prefix(name), limit)
+        elif email is not None:
+            rows = await self._run(self._query, SQL_BY_EMAIL, normalize_email(email), limit)
+        elif name is not None:
+            rows = await self._run(self._query, SQL_BY_NAME, like_prefix(name), limit)
+        else:
+            rows = []
+        return [row_to_user(row) for row in rows]
+
+    async def _insert(self, params_list: List[Dict[str, Any]]) -> List[Union[Dict[str, Any], Exception]]:
+        return await self._run(self._insert_sync, params_list)
+
+    def _insert_sync(self, params_list: List[Dict[str, Any]]) -> List[Union[Dict[str, Any], Exception]]:
+        """Insert a group of users in one transaction. BEGIN IMMEDIATE also serializes writers across processes"""
+        results: List[Union[Dict[str, Any], Exception]] = []
+        written = 0
+        with self._connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                next_id = conn.execute(SQL_MAX_ID).fetchone()[0] + 1
+                new_emails = set()
+                for params in params_list:
+                    try:
+                        email = normalize_email(params["email"])
+                        if email in new_emails or conn.execute(SQL_EMAIL_TAKEN, (email,)).fetchone():
+                            raise DuplicateEmailError(f"Email {params['email']} already exists")
+                        user = build_user(next_id, params)
+                    except Exception as e:
+                        results.append(e)
+                        continue
+                    row = self._row(user)
+                    conn.execute(SQL_INSERT, row)
+                    written += row_bytes([row])
+                    new_emails.add(email)
+                    results.append(user)
+                    next_id += 1
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        with self._io_lock:
+            self.bytes_written += written
+        return results
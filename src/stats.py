@@ -0,0 +1,33 @@
+import math
+from typing import Any, Dict, List, Sequence
+
+
+def percentile(sorted_values: Sequence[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted sequence"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(latencies: List[float], elapsed: float, errors: int = 0) -> Dict[str, Any]:
+    """Throughput and latency percentiles (in ms) for operations that took `latencies` seconds over `elapsed` seconds"""
+    ordered = sorted(latencies)
+    return {
+        "ops": len(ordered),
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "ops_per_s": round(len(ordered) / elapsed, 1) if elapsed > 0 else 0.0,
+        "p50_ms": round(percentile(ordered, 50) * 1000, 3),
+        "p95_ms": round(percentile(ordered, 95) * 1000, 3),
+        "p99_ms": round(percentile(ordered, 99) * 1000, 3),
+        "max_ms": round(ordered[-1] * 1000, 3) if ordered else 0.0,
+    }
+
+
+def formatSummary(name: str, summary: Dict[str, Any]) -> str:
+    return (
+        f"{name}: {summary['ops']} ops ({summary['errors']} errors) in {summary['elapsed_s']}s, "
+        f"{summary['ops_per_s']} ops/s, p50 {summary['p50_ms']}ms, p95 {summary['p95_ms']}ms, "
+        f"p99 {summary['p99_ms']}ms, max {summary['max_ms']}ms"
+    )
@@ -0,0 +1,169 @@
+import os
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+import codec
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, a single writer is up to the user
+    fcntl = None
+
+
+class StorageLockedError(RuntimeError):
+    pass
+
+
+def atomic_write(path: Path, data: bytes) -> None:
+    """Replace `path` with `data` via temp file + fsync + rename, so readers never see a partial file"""
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+
+    # Persist the rename itself (not supported on Windows)
+    if hasattr(os, "O_DIRECTORY"):
+        dir_fd = os.open(path.parent, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+
+class JournalStorage:
+    """Snapshot file (the classic users.json) plus an append-only JSON-lines journal of mutations.
+
+    Every insert costs one appended line. Once the journal holds at least `compact_every` records and
+    as many bytes as the snapshot, it is folded into a new snapshot, so rewriting the snapshot costs
+    O(1) amortized bytes per insert however large the table grows. Snapshots are written in `format`
+    (see codec.FORMATS) and read in any of them. `bytes_read`/`bytes_written` count file bytes since startup.
+
+    Compaction can run while inserts continue: rotate() moves the journal aside, and write_snapshot()
+    later replaces the snapshot and drops the rotated journal. load() replays both journals.
+
+    Ids are assigned from the writer's in-memory table, so only one process may write: a writer
+    calls lock() first, which holds an exclusive lock on `<path>.lock` until unlock().
+    """
+
+    def __init__(self, path: str, journal_path: Optional[str] = None, compact_every: int = 1000, format: str = "json"):
+        codec.check_format(format)
+        self.path = Path(path)
+        self.journal_path = Path(journal_path) if journal_path else self.path.with_suffix(".journal.jsonl")
+        self.rotated_path = self.journal_path.with_name(self.journal_path.name + ".compacting")
+        self.compact_every = compact_every
+        self.format = format
+        self.journal_size = 0
+        self.journal_bytes = 0
+        self.snapshot_bytes = 0
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.lock_path = self.path.with_name(self.path.name + ".lock")
+        self._lock_fd: Optional[int] = None
+
+    def lock(self) -> None:
+        """Become the only writer of this snapshot and journal, or raise StorageLockedError"""
+        if self._lock_fd is not None or fcntl is None:
+            return
+        fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            raise StorageLockedError(
+                f"{self.path} is in use by another process; run one server per data file, "
+                "attach clients to it with MCP_SERVER_URL, or use USERS_STORAGE=sqlite"
+            ) from None
+        self._lock_fd = fd
+
+    def unlock(self) -> None:
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)  # closing the descriptor releases the lock
+            self._lock_fd = None
+
+    def load(self) -> List[Dict[str, Any]]:
+        """Rebuild the table from the snapshot and the journal tail"""
+        users: List[Dict[str, Any]] = []
+        self.snapshot_bytes = 0
+        if self.path.exists():
+            data = self.path.read_bytes()
+            self.bytes_read += len(data)
+            self.snapshot_bytes = len(data)
+            users = codec.decode(data)
+            del data
+
+        # A crash before a compaction dropped its journal leaves already-snapshotted records behind
+        seen = {user['id'] for user in users}
+        self.journal_size = 0
+        self.journal_bytes = 0
+        # The rotated journal, if a compaction did not finish, holds the older records
+        for path in (self.rotated_path, self.journal_path):
+            if not path.exists():
+                continue
+            with open(path, 'rb') as f:
+                for line in f:
+                    try:
+                        record = codec.loads(line)
+                    except ValueError:
+                        # Torn last line from a crash mid-append: that mutation was never acknowledged
+                        break
+                    self.bytes_read += len(line)
+                    if record.get("op") == "create" and record["user"]['id'] not in seen:
+                        seen.add(record["user"]['id'])
+                        users.append(record["user"])
+                    self.journal_size += 1
+                    self.journal_bytes += len(line)
+        return users
+
+    def has_journal(self) -> bool:
+        return self.journal_path.exists() or self.rotated_path.exists()
+
+    def append(self, users: Iterable[Any]) -> None:
+        """Durably journal newly created users (dicts, or records with a to_dict method)"""
+        records = [codec.dumps({"op": "create", "user": user}) + b"\n" for user in users]
+        lines = b"".join(records)
+        with open(self.journal_path, 'ab') as f:
+            f.write(lines)
+            f.flush()
+            os.fsync(f.fileno())
+        self.journal_size += len(records)
+        self.journal_bytes += len(lines)
+        self.bytes_written += len(lines)
+
+    def needs_compaction(self) -> bool:
+        return self.journal_size >= self.compact_every and self.journal_bytes >= self.snapshot_bytes
+
+    def rotate(self) -> None:
+        """Move the journal aside for a compaction; later appends start a new journal"""
+        if self.journal_path.exists():
+            if self.rotated_path.exists():
+                # An earlier compaction failed: its rotated journal must survive until a snapshot succeeds
+                data = self.journal_path.read_bytes()
+                with open(self.rotated_path, 'ab') as f:
+                    f.write(data)
+                    f.flush()
+                    os.fsync(f.fileno())
+                self.bytes_written += len(data)
+                self.journal_path.unlink()
+            else:
+                os.replace(self.journal_path, self.rotated_path)
+        self.journal_size = 0
+        self.journal_bytes = 0
+
+    def write_snapshot(self, users: List[Any]) -> None:
+        """Write a snapshot of `users` (dicts, or records with a to_dict method), superseding the rotated journal"""
+        data = codec.encode(users, self.format)
+        atomic_write(self.path, data)
+        self.bytes_written += len(data)
+        self.snapshot_bytes = len(data)
+        self.rotated_path.unlink(missing_ok=True)
+
+    def compact(self, users: List[Any]) -> None:
+        """Fold the whole journal into a fresh snapshot of `users`, with no inserts running"""
+        self.rotate()
+        self.write_snapshot(users)
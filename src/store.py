@@ -0,0 +1,339 @@
+import asyncio
+import bisect
+import logging
+from abc import ABC, abstractmethod
+from concurrent.futures import Executor
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+import codec
+from storage import JournalStorage
+
+logger = logging.getLogger(__name__)
+
+
+class DuplicateEmailError(ValueError):
+    """Raised for an insert whose email is already taken"""
+
+
+def normalize_email(email: str) -> str:
+    return email.strip().lower()
+
+
+def build_user(user_id: int, params: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "id": user_id,
+        "name": params["name"],
+        "email": params["email"],
+        "address": params.get("address", ""),
+        "phone": params.get("phone", "")
+    }
+
+
+class UserRecord:
+    """One user in memory. Slots instead of a per-user dict: about 100 bytes less per user"""
+
+    __slots__ = ("id", "name", "email", "address", "phone")
+
+    def __init__(self, id: int, name: str, email: str, address: Any = "", phone: Any = ""):
+        self.id = id
+        self.name = name
+        self.email = email
+        self.address = address
+        self.phone = phone
+
+    @classmethod
+    def from_dict(cls, user: Dict[str, Any]) -> "UserRecord":
+        return cls(user['id'], user['name'], user['email'], user.get('address', ""), user.get('phone', ""))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"id": self.id, "name": self.name, "email": self.email, "address": self.address, "phone": self.phone}
+
+
+class BaseUserStore(ABC):
+    """Storage interface used by the server handlers.
+
+    All mutations go through a single writer task: concurrent `create` calls are queued, and every
+    insert waiting when the writer wakes up is committed together by `_insert` (group commit).
+    Blocking I/O runs on `executor` so it never blocks the event loop; with `offload_json` the
+    JSON encoding of resource payloads is moved there too.
+    """
+
+    def __init__(self, executor: Optional[Executor] = None, offload_json: bool = False):
+        self.executor = executor
+        self.offload_json = offload_json
+        self._queue: Optional[asyncio.Queue] = None
+        self._writer: Optional[asyncio.Task] = None
+
+    @abstractmethod
+    async def count(self) -> int:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def all(self) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get(self, user_id: int) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def version(self) -> int:
+        """Version of the data: the highest user id.
+
+        Users are only ever created, with increasing ids, so the users created after version N are
+        exactly those with id > N, i.e. `page(after=N)`.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    async def page(self, after: int = 0, limit: int = 100) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        """Return up to `limit` users with id > `after`, plus the cursor of the next page (None on the last page)"""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def search(self, email: Optional[str] = None, name: Optional[str] = None, limit: int = 20) -> List[Dict[str, Any]]:
+        """Find users by exact email (case-insensitive, in id order) and/or name prefix (in name order)"""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def _insert(self, params_list: List[Dict[str, Any]]) -> List[Union[Dict[str, Any], Exception]]:
+        """Persist a group of inserts. Returns, per item, the stored user or the error that rejected it"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def io_stats(self) -> Dict[str, int]:
+        """Bytes read from and written to storage since startup"""
+        raise NotImplementedError
+
+    async def render(self, payload: Any) -> Any:
+        """Return a resource payload, pre-encoded to JSON off the event loop when `offload_json` is set"""
+        if not self.offload_json:
+            return payload
+        return (await self._run(codec.dumps, payload)).decode()
+
+    async def create(self, params: Dict[str, Any]) -> int:
+        """Queue an insert for the writer task and return the id it was assigned"""
+        result = (await self.create_many([params]))[0]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    async def create_many(self, params_list: List[Dict[str, Any]]) -> List[Union[int, Exception]]:
+        """Insert several users in one commit. Returns, per item, its id (contiguous) or the error that rejected it"""
+        self._ensure_writer()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((params_list, future))
+        return await future
+
+    async def close(self) -> None:
+        """Let the writer commit what is queued, then stop it"""
+        if self._writer is None or self._writer.done():
+            return
+        await self._queue.join()
+        self._writer.cancel()
+        try:
+            await self._writer
+        except asyncio.CancelledError:
+            pass
+        self._writer = None
+
+    async def _run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+
+    def _ensure_writer(self) -> None:
+        if self._writer is None or self._writer.done():
+            self._queue = asyncio.Queue()
+            self._writer = asyncio.get_running_loop().create_task(self._write_loop())
+
+    async def _write_loop(self) -> None:
+        while True:
+            batch: List[Tuple[List[Dict[str, Any]], asyncio.Future]] = [await self._queue.get()]
+            while not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            try:
+                await self._commit(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _commit(self, batch: List[Tuple[List[Dict[str, Any]], asyncio.Future]]) -> None:
+        # Callers that gave up while queued are dropped before any id is handed out
+        batch = [(params_list, future) for params_list, future in batch if not future.done()]
+        if not batch:
+            return
+
+        try:
+            results = await self._insert([params for params_list, _ in batch for params in params_list])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        start = 0
+        for params_list, future in batch:
+            request_results = results[start:start + len(params_list)]
+            start += len(params_list)
+            if not future.done():
+                future.set_result([r if isinstance(r, Exception) else r['id'] for r in request_results])
+
+
+class UserStore(BaseUserStore):
+    """Users table kept in memory, indexed by id, email and name, and persisted through a journaled storage backend.
+
+    Users are held as UserRecords and only turned into dicts when handed out. The indexes store ids rather
+    than copies of names and emails wherever that is possible.
+    """
+
+    def __init__(self, storage: JournalStorage, executor: Optional[Executor] = None, offload_json: bool = False):
+        super().__init__(executor=executor, offload_json=offload_json)
+        self.storage = storage
+        self._users: Dict[int, UserRecord] = {}
+        self._ids: List[int] = []  # sorted, for cursor pagination
+        # normalized email -> id, or a list of ids for the duplicates legacy data may hold
+        self._by_email: Dict[str, Union[int, List[int]]] = {}
+        # ids sorted by (lowercased name, id), for prefix search. Built on the first name search, not at startup
+        self._by_name: Optional[List[int]] = None
+        self._max_id = 0
+        self._compaction: Optional[asyncio.Task] = None
+        self.load()
+
+    def __len__(self) -> int:
+        return len(self._users)
+
+    def load(self) -> None:
+        """(Re)load the table into memory. Called once at startup"""
+        self.storage.lock()
+        users = self.storage.load()
+        # Swap each dict for its record in place, so the dicts are freed as we go rather than all at the end
+        for index, user in enumerate(users):
+            users[index] = UserRecord(user['id'], user['name'], user['email'], user.get('address', ""), user.get('phone', ""))
+        self._users = {user.id: user for user in users}
+        del users
+        self._ids = sorted(self._users)
+        self._max_id = self._ids[-1] if self._ids else 0
+        self._by_email = {}
+        for user_id in self._ids:
+            self._index_email(self._users[user_id].email, user_id)
+        self._by_name = None
+
+        # Fold any journal tail (including a torn last line) into a clean snapshot before appending again
+        if self.storage.has_journal():
+            self.storage.compact(list(self._users.values()))
+
+    def _name_index(self) -> List[int]:
+        if self._by_name is None:
+            # Sorting (name, id) tuples is much faster than sorting ids with a key function; only the ids are kept
+            self._by_name = [user_id for _, user_id in sorted((user.name.lower(), user.id) for user in self._users.values())]
+        return self._by_name
+
+    def _name_key(self, user_id: int) -> Tuple[str, int]:
+        return self._users[user_id].name.lower(), user_id
+
+    def _index_email(self, email: str, user_id: int) -> None:
+        key = normalize_email(email)
+        if key == email:
+            key = email  # share the record's string instead of keeping an equal copy
+        ids = self._by_email.setdefault(key, user_id)
+        if ids == user_id:
+            return
+        if isinstance(ids, list):
+            ids.append(user_id)
+        else:
+            self._by_email[key] = [ids, user_id]
+
+    def _email_ids(self, email: str) -> List[int]:
+        ids = self._by_email.get(normalize_email(email))
+        if ids is None:
+            return []
+        return ids if isinstance(ids, list) else [ids]
+
+    def io_stats(self) -> Dict[str, int]:
+        return {"bytes_read": self.storage.bytes_read, "bytes_written": self.storage.bytes_written}
+
+    async def count(self) -> int:
+        return len(self._users)
+
+    async def all(self) -> List[Dict[str, Any]]:
+        return [user.to_dict() for user in self._users.values()]
+
+    async def version(self) -> int:
+        return self._max_id
+
+    async def get(self, user_id: int) -> Optional[Dict[str, Any]]:
+        user = self._users.get(user_id)
+        return user.to_dict() if user is not None else None
+
+    async def page(self, after: int = 0, limit: int = 100) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        start = bisect.bisect_right(self._ids, after)
+        ids = self._ids[start:start + limit]
+        next_cursor = ids[-1] if start + limit < len(self._ids) else None
+        return [self._users[user_id].to_dict() for user_id in ids], next_cursor
+
+    async def search(self, email: Optional[str] = None, name: Optional[str] = None, limit: int = 20) -> List[Dict[str, Any]]:
+        if email is not None:
+            ids = self._email_ids(email)
+            if name is not None:
+                prefix = name.lower()
+                ids = [user_id for user_id in ids if self._users[user_id].name.lower().startswith(prefix)]
+            return [self._users[user_id].to_dict() for user_id in ids[:limit]]
+
+        if name is None:
+            return []
+        prefix = name.lower()
+        users = []
+        by_name = self._name_index()
+        for index in range(bisect.bisect_left(by_name, (prefix,), key=self._name_key), len(by_name)):
+            user = self._users[by_name[index]]
+            if not user.name.lower().startswith(prefix) or len(users) == limit:
+                break
+            users.append(user.to_dict())
+        return users
+
+    async def _insert(self, params_list: List[Dict[str, Any]]) -> List[Union[Dict[str, Any], Exception]]:
+        """Assign ids to a group of inserts and persist them with one journal write"""
+        new_users: List[UserRecord] = []
+        new_emails = set()
+        results: List[Union[Dict[str, Any], Exception]] = []
+        for params in params_list:
+            try:
+                email = normalize_email(params["email"])
+                if email in self._by_email or email in new_emails:
+                    raise DuplicateEmailError(f"Email {params['email']} already exists")
+                user = build_user(self._max_id + len(new_users) + 1, params)
+            except Exception as e:
+                results.append(e)
+                continue
+            new_emails.add(email)
+            new_users.append(UserRecord.from_dict(user))
+            results.append(user)
+
+        if not new_users:
+            return results
+
+        await self._run(self.storage.append, new_users)
+        for user in new_users:
+            self._users[user.id] = user
+            self._ids.append(user.id)  # ids only grow, so the list stays sorted
+            self._index_email(user.email, user.id)
+            if self._by_name is not None:
+                bisect.insort(self._by_name, user.id, key=self._name_key)
+        self._max_id += len(new_users)
+
+        if self.storage.needs_compaction() and (self._compaction is None or self._compaction.done()):
+            # Rotate before the next append, then rewrite the snapshot off the commit path
+            await self._run(self.storage.rotate)
+            self._compaction = asyncio.get_running_loop().create_task(self._compact(list(self._users.values())))
+        return results
+
+    async def _compact(self, users: List[UserRecord]) -> None:
+        try:
+            await self._run(self.storage.write_snapshot, users)
+        except Exception:
+            # The rotated journal still holds every acknowledged insert; retried by the next compaction
+            logger.exception("Failed to compact users journal")
+
+    async def close(self) -> None:
+        await super().close()
+        if self._compaction is not None:
+            await self._compaction
+            self._compaction = None
@@ -0,0 +1,46 @@
+import asyncio
+import logging
+import weakref
+from typing import Dict, Iterable, List, Tuple
+from pydantic import AnyUrl
+from mcp.server.session import ServerSession
+
+logger = logging.getLogger(__name__)
+
+
+class Subscriptions:
+    """Which sessions subscribed to which resource URIs, for resources/updated notifications.
+
+    Sessions are held weakly, and a session that fails to receive a notification is unsubscribed,
+    so disconnected clients do not accumulate.
+    """
+
+    def __init__(self):
+        self._sessions: Dict[str, "weakref.WeakSet[ServerSession]"] = {}
+
+    def subscribe(self, uri: str, session: ServerSession) -> None:
+        self._sessions.setdefault(uri, weakref.WeakSet()).add(session)
+
+    def unsubscribe(self, uri: str, session: ServerSession) -> None:
+        sessions = self._sessions.get(uri)
+        if sessions is None:
+            return
+        sessions.discard(session)
+        if not sessions:
+            del self._sessions[uri]
+
+    def subscribers(self, uri: str) -> List[ServerSession]:
+        return list(self._sessions.get(uri, ()))
+
+    async def notify(self, uris: Iterable[str]) -> None:
+        """Send resources/updated for every URI to every session subscribed to it"""
+        sends: List[Tuple[str, ServerSession]] = [(uri, session) for uri in uris for session in self.subscribers(uri)]
+        if not sends:
+            return
+        results = await asyncio.gather(
+            *[session.send_resource_updated(AnyUrl(uri)) for uri, session in sends], return_exceptions=True
+        )
+        for (uri, session), result in zip(sends, results):
+            if isinstance(result, Exception):
+                logger.debug("Dropping subscriber of %s: %s", uri, result)
+                self.unsubscribe(uri, session)
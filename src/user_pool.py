@@ -0,0 +1,152 @@
+import asyncio
+import collections
+import json
+import logging
+import random
+import re
+import time
+from typing import Any, Callable, Deque, Dict, List, Optional
+import mcp.types as types
+from mcp.server.session import ServerSession
+
+logger = logging.getLogger(__name__)
+
+FIRST_NAMES = ["Olivia", "Liam", "Emma", "Noah", "Ava", "Elijah", "Sophia", "James", "Mia", "Lucas", "Amelia", "Mason"]
+LAST_NAMES = ["Smith", "Johnson", "Garcia", "Brown", "Miller", "Davis", "Rodriguez", "Martinez", "Lopez", "Wilson"]
+STREETS = ["Maple St", "Oak Ave", "Pine Rd", "Cedar Ln", "Elm St", "Willow Way", "Birch Blvd"]
+CITIES = [("Springfield", "IL"), ("Austin", "TX"), ("Columbus", "OH"), ("Denver", "CO"), ("Portland", "OR")]
+
+
+class OfflineUserGenerator:
+    """Fake users for when sampling is unavailable.
+
+    With a seed the sequence is reproducible, so a seeded generator replays emails a persistent store
+    already holds. Without one it is seeded from os.urandom, unique per process.
+    """
+
+    def __init__(self, seed: Optional[int] = None):
+        self._random = random.Random(seed)
+
+    def __call__(self) -> Dict[str, Any]:
+        rnd = self._random
+        first, last = rnd.choice(FIRST_NAMES), rnd.choice(LAST_NAMES)
+        city, state = rnd.choice(CITIES)
+        return {
+            "name": f"{first} {last}",
+            "email": f"{first.lower()}.{last.lower()}{rnd.randrange(10**6)}@example.com",
+            "address": f"{rnd.randrange(1, 9999)} {rnd.choice(STREETS)}, {city}, {state}",
+            "phone": f"555-{rnd.randrange(10**4):04d}",
+        }
+
+
+def sampledText(result: Any) -> Optional[str]:
+    """Text of a sampling result. SDKs can return different shapes"""
+    content = getattr(result, "content", None)
+    if isinstance(content, list) and content:
+        content = content[0]
+
+    if content is None and isinstance(result, dict):
+        cont = result.get("content")
+        if isinstance(cont, list) and cont:
+            content = cont[0]
+        else:
+            content = cont
+
+    if isinstance(content, dict):
+        text_blob = content.get("text")
+    else:
+        text_blob = getattr(content, "text", None)
+    return text_blob if isinstance(text_blob, str) and text_blob else None
+
+
+def parseUsers(text: str) -> List[Dict[str, Any]]:
+    """Fake users from model output: a JSON array of objects (or a single object), possibly fenced"""
+    raw = text.strip()
+    # Remove possible fenced codeblocks
+    raw = raw.removeprefix("```json").removeprefix("```js").removeprefix("```").removesuffix("```").strip()
+
+    # Find the first JSON array, else the first JSON object
+    m = re.search(r"\[[\s\S]*\]", raw) or re.search(r"\{[\s\S]*\}", raw)
+    data = json.loads(m.group(0) if m else raw)
+    if isinstance(data, dict):
+        data = [data]
+    return [user for user in data if isinstance(user, dict) and user.get("name") and user.get("email")]
+
+
+class UserPool:
+    """Pre-generated fake users, so create_random_user_tool is a pop instead of a sampling round trip.
+
+    When the pool drops to `low_water` it is refilled in the background with one sampling request for
+    `batch_size` users. If the client cannot sample (or sampling fails) the offline generator is used.
+    `on_sample` is called with the round-trip time in seconds of every sampling request.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = 20,
+        low_water: int = 5,
+        refill_timeout: float = 60.0,
+        seed: Optional[int] = None,
+        on_sample: Optional[Callable[[float], None]] = None,
+    ):
+        self.batch_size = batch_size
+        self.low_water = low_water
+        self.refill_timeout = refill_timeout
+        self.offline = OfflineUserGenerator(seed)
+        self.on_sample = on_sample
+        self._users: Deque[Dict[str, Any]] = collections.deque()
+        self._refill: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._users)
+
+    async def pop(self, session: ServerSession) -> Dict[str, Any]:
+        if not canSample(session):
+            return self._users.popleft() if self._users else self.offline()
+
+        if len(self._users) <= self.low_water:
+            self._start_refill(session)
+        if not self._users and self._refill is not None:
+            # Cold pool: wait for the refill already in flight rather than sampling a single user
+            try:
+                await asyncio.wait_for(asyncio.shield(self._refill), self.refill_timeout)
+            except Exception:
+                pass
+        return self._users.popleft() if self._users else self.offline()
+
+    def _start_refill(self, session: ServerSession) -> None:
+        if self._refill is None or self._refill.done():
+            self._refill = asyncio.get_running_loop().create_task(self._sample(session))
+
+    async def _sample(self, session: ServerSession) -> None:
+        start = time.perf_counter()
+        try:
+            result = await session.create_message(
+                messages=[
+                    types.SamplingMessage(
+                        role="user",
+                        content=types.TextContent(
+                            type="text",
+                            text=(
+                                f"Generate {self.batch_size} different fake users. Each user should have a realistic name, "
+                                "unique email, address, and phone number. Return this data as a JSON array of objects with "
+                                "the keys name, email, address and phone, with no other text or formatter so it can be "
+                                "used with JSON.parse."
+                            ),
+                        ),
+                    )
+                ],
+                max_tokens=256 * self.batch_size,
+                metadata={"background": True},
+            )
+            if self.on_sample is not None:
+                self.on_sample(time.perf_counter() - start)
+            text = sampledText(result)
+            if text:
+                self._users.extend(parseUsers(text))
+        except Exception:
+            logger.exception("Failed to refill fake user pool")
+
+
+def canSample(session: ServerSession) -> bool:
+    return session.check_client_capability(types.ClientCapabilities(sampling=types.SamplingCapability()))
@@ -0,0 +1,104 @@
+from typing import List, Optional
+
+import mcp.types as types
+from pydantic import BaseModel, TypeAdapter
+
+from gemini_tools import ToolDeclarationCache, toFunctionDeclaration, toGeminiSchema, toGeminiTools
+from schemas import UserSchema
+
+
+class Address(BaseModel):
+    street: str
+    city: Optional[str] = None
+
+
+class Person(BaseModel):
+    name: str
+    addresses: List[Address]
+
+
+class Node(BaseModel):
+    value: int
+    children: List["Node"] = []
+
+
+def schemaOf(annotation):
+    schema = TypeAdapter(annotation).json_schema()
+    return toGeminiSchema(schema, schema.get("$defs", {}))
+
+
+def test_ref_in_array_items_is_inlined():
+    assert schemaOf(List[UserSchema]) == {
+        "type": "array",
+        "items": {
+            "type": "object",
+            "properties": {
+                "name": {"type": "string"},
+                "email": {"type": "string"},
+                "address": {"type": "string", "nullable": True},
+                "phone": {"type": "string", "nullable": True},
+            },
+            "required": ["name", "email"],
+        },
+    }
+
+
+def test_refs_between_defs_are_inlined():
+    # Person's def refers to Address's def from inside its own array items
+    person = schemaOf(List[Person])["items"]
+    assert person["properties"]["addresses"]["items"]["properties"]["street"] == {"type": "string"}
+    assert "$ref" not in repr(person)
+
+
+def test_nested_defs_are_used():
+    schema = {
+        "type": "object",
+        "properties": {
+            "users": {
+                "type": "array",
+                "$defs": {"User": {"type": "object", "properties": {"id": {"type": "integer"}}}},
+                "items": {"$ref": "#/$defs/User"},
+            },
+        },
+    }
+    users = toGeminiSchema(schema, {})["properties"]["users"]
+    assert users["items"] == {"type": "object", "properties": {"id": {"type": "integer"}}}
+
+
+def test_nullable_variants():
+    assert toGeminiSchema({"anyOf": [{"type": "integer"}, {"type": "null"}], "description": "n"}, {}) == {
+        "type": "integer", "nullable": True, "description": "n",
+    }
+    assert toGeminiSchema({"type": ["string", "null"]}, {}) == {"type": "string", "nullable": True}
+    assert toGeminiSchema({"anyOf": [{"type": "integer"}, {"type": "string"}, {"type": "null"}]}, {}) == {
+        "anyOf": [{"type": "integer"}, {"type": "string"}], "nullable": True,
+    }
+
+
+def test_recursive_ref_stops_expanding():
+    node = schemaOf(Node)
+    children = node["properties"]["children"]
+    assert children["type"] == "array"
+    assert children["items"] == {"type": "object"}
+
+
+def test_declarations_are_accepted_and_cached():
+    tools = [
+        types.Tool(name="create_users_tool", description="d", inputSchema={
+            "type": "object",
+            "properties": {"users": TypeAdapter(List[UserSchema]).json_schema(ref_template="#/$defs/{model}")},
+            "$defs": TypeAdapter(List[UserSchema]).json_schema()["$defs"],
+            "required": ["users"],
+        }),
+        types.Tool(name="create_random_user_tool", inputSchema={"type": "object", "properties": {}}),
+    ]
+    declaration = toFunctionDeclaration(tools[0])
+    assert declaration.parameters.properties["users"].items.properties["email"].type == "STRING"
+    assert toFunctionDeclaration(tools[1]).parameters is None
+
+    cache = ToolDeclarationCache()
+    first = cache.get(tools)
+    assert cache.get(tools) is first
+    cache.invalidate()
+    assert cache.get(tools) is not first
+    assert len(toGeminiTools(tools)[0].function_declarations) == 2
@@ -0,0 +1,50 @@
+import asyncio
+
+import httpx
+import pytest
+from google.genai import errors as genai_errors
+
+from llm import LLM, FakeProvider
+
+
+def generate(provider, retries=3, timeout=5.0):
+    llm = LLM(provider, model="fake", retries=retries, backoff=0.001, timeout=timeout)
+    return asyncio.run(llm.generate("hello"))
+
+
+def test_server_errors_are_retried():
+    provider = FakeProvider(failures=2)
+    assert generate(provider).text == "ok"
+    assert provider.calls == 3
+
+
+@pytest.mark.parametrize("error", [
+    lambda: httpx.ConnectError("refused"),
+    lambda: httpx.ReadTimeout("slow"),
+    lambda: ConnectionResetError("reset"),
+])
+def test_network_errors_are_retried(error):
+    provider = FakeProvider(failures=1, error=error)
+    assert generate(provider).text == "ok"
+    assert provider.calls == 2
+
+
+def test_gives_up_after_retries():
+    provider = FakeProvider(failures=10)
+    with pytest.raises(genai_errors.ServerError):
+        generate(provider, retries=2)
+    assert provider.calls == 3
+
+
+def test_client_errors_are_not_retried():
+    provider = FakeProvider(failures=1, error=lambda: genai_errors.ClientError(400, {"error": {"message": "bad request"}}))
+    with pytest.raises(genai_errors.ClientError):
+        generate(provider)
+    assert provider.calls == 1
+
+
+def test_attempt_timeout_is_retried():
+    provider = FakeProvider(latency=0.2)
+    with pytest.raises(asyncio.TimeoutError):
+        generate(provider, retries=1, timeout=0.01)
+    assert provider.calls == 2
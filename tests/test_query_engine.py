@@ -0,0 +1,92 @@
+import asyncio
+
+import mcp.types as types
+import pytest
+from google.genai import types as genai_types
+
+from llm import LLM, FakeProvider, FakeReplies, functionCallResponse
+from query_engine import QueryEngine
+
+
+class FakeSession:
+    """call_tool of a ClientSession; every call waits until `concurrent` calls are in flight at once"""
+
+    def __init__(self, concurrent: int = 1):
+        self.calls = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._all_started = asyncio.Event()
+        self._concurrent = concurrent
+
+    async def call_tool(self, name, arguments=None):
+        self.calls.append((name, arguments))
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        if self.in_flight >= self._concurrent:
+            self._all_started.set()
+        await asyncio.wait_for(self._all_started.wait(), 1)
+        self.in_flight -= 1
+        if name == "broken_tool":
+            return types.CallToolResult(content=[types.TextContent(type="text", text="boom")], isError=True)
+        return types.CallToolResult(content=[types.TextContent(type="text", text=f"{name} {arguments}")])
+
+
+def engine(session, reply, **kwargs):
+    return QueryEngine(session, LLM(FakeProvider(reply=reply), model="fake", retries=0), **kwargs)
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_function_calls_run_concurrently_and_all_results_are_sent_back():
+    calls = genai_types.GenerateContentResponse(candidates=[genai_types.Candidate(content=genai_types.Content(
+        role="model",
+        parts=[
+            genai_types.Part(function_call=genai_types.FunctionCall(name="search_users_tool", args={"name": "A"})),
+            genai_types.Part(function_call=genai_types.FunctionCall(name="search_users_tool", args={"name": "B"})),
+            genai_types.Part(function_call=genai_types.FunctionCall(name="broken_tool", args={})),
+        ],
+    ))])
+    conversations = []
+
+    def reply(contents):
+        conversations.append(list(contents))
+        return calls if len(conversations) == 1 else FakeReplies()(contents)
+
+    async def check():
+        session = FakeSession(concurrent=3)
+        answer = await engine(session, reply).run("find A and B", [])
+        return session, answer
+
+    session, answer = run(check())
+    assert session.max_in_flight == 3
+    assert answer.startswith("Done: ")
+    # The second model call sees the prompt, the model's calls and one response per call, in call order
+    prompt, model_turn, tool_turn = conversations[1]
+    assert len(model_turn.parts) == 3
+    assert [part.function_response.response for part in tool_turn.parts] == [
+        {"result": "search_users_tool {'name': 'A'}"},
+        {"result": "search_users_tool {'name': 'B'}"},
+        {"error": "boom"},
+    ]
+
+
+def test_stops_after_max_steps():
+    session = FakeSession()
+    answer = run(engine(session, lambda contents: functionCallResponse("search_users_tool", {"name": "A"}), max_steps=3)
+                 .run("loop forever", []))
+    assert answer == "Stopped after 3 steps without a final answer"
+    assert len(session.calls) == 3
+
+
+def test_text_answer_ends_the_loop():
+    session = FakeSession()
+    assert run(engine(session, lambda contents: "no tools needed").run("hi", [])) == "no tools needed"
+    assert session.calls == []
+
+
+def test_timeout_raises():
+    slow = QueryEngine(FakeSession(), LLM(FakeProvider(latency=1.0), model="fake", retries=0), timeout=0.05)
+    with pytest.raises(asyncio.TimeoutError):
+        run(slow.run("hi", []))
@@ -0,0 +1,124 @@
+import asyncio
+import json
+
+import pytest
+
+from storage import JournalStorage, StorageLockedError
+from store import UserStore
+
+USERS = [
+    {"id": 1, "name": "Ann", "email": "ann@example.com", "address": "", "phone": ""},
+    {"id": 2, "name": "Bob", "email": "bob@example.com", "address": "", "phone": ""},
+]
+
+
+def user(user_id):
+    return {"id": user_id, "name": f"User {user_id}", "email": f"user{user_id}@example.com", "address": "", "phone": ""}
+
+
+@pytest.fixture
+def storage(tmp_path):
+    path = tmp_path / "users.json"
+    path.write_text(json.dumps(USERS))
+    storage = JournalStorage(str(path), compact_every=1000)
+    yield storage
+    storage.unlock()
+
+
+def test_load_replays_journal(storage):
+    storage.append([user(3), user(4)])
+    assert [u["id"] for u in JournalStorage(str(storage.path)).load()] == [1, 2, 3, 4]
+
+
+def test_torn_last_line_is_ignored(storage):
+    storage.append([user(3)])
+    with open(storage.journal_path, "ab") as f:
+        f.write(b'{"op": "create", "user": {"id": 4, "na')
+    loaded = JournalStorage(str(storage.path))
+    assert [u["id"] for u in loaded.load()] == [1, 2, 3]
+    assert loaded.journal_size == 1
+
+
+def test_crash_between_rename_and_unlink(storage):
+    storage.append([user(3)])
+    # compact() wrote the snapshot but did not get to drop the journal
+    journal = storage.journal_path.read_bytes()
+    storage.compact(USERS + [user(3)])
+    storage.journal_path.write_bytes(journal)
+    assert [u["id"] for u in JournalStorage(str(storage.path)).load()] == [1, 2, 3]
+
+
+def test_compact_folds_journal(storage):
+    storage.append([user(3)])
+    storage.compact(USERS + [user(3)])
+    assert not storage.journal_path.exists()
+    assert storage.journal_size == 0
+    assert [u["id"] for u in JournalStorage(str(storage.path)).load()] == [1, 2, 3]
+
+
+def test_second_writer_is_refused(storage):
+    storage.lock()
+    with pytest.raises(StorageLockedError):
+        JournalStorage(str(storage.path)).lock()
+    storage.unlock()
+    other = JournalStorage(str(storage.path))
+    other.lock()
+    other.unlock()
+
+
+def test_store_locks_its_storage(storage):
+    UserStore(storage)
+    with pytest.raises(StorageLockedError):
+        UserStore(JournalStorage(str(storage.path)))
+
+
+def test_concurrent_creates_are_group_committed(storage):
+    appends = []
+    append = storage.append
+    storage.append = lambda users: appends.append(len(users)) or append(users)
+    store = UserStore(storage)
+
+    async def createAll():
+        results = await asyncio.gather(*[store.create({"name": f"N{i}", "email": f"n{i}@example.com"}) for i in range(20)])
+        await store.close()
+        return results
+
+    ids = asyncio.run(createAll())
+    assert sorted(ids) == list(range(3, 23))
+    assert sum(appends) == 20 and len(appends) < 20
+    storage.unlock()
+    assert len(JournalStorage(str(storage.path)).load()) == 22
+
+
+def test_compaction_costs_constant_bytes_per_insert(tmp_path):
+    path = tmp_path / "users.json"
+    path.write_text(json.dumps([user(i) for i in range(1, 2001)]))
+    storage = JournalStorage(str(path), compact_every=10)
+    store = UserStore(storage)
+    line = len(json.dumps({"op": "create", "user": user(9999)}, separators=(",", ":"))) + 1
+
+    async def insertAll():
+        for batch in range(200):
+            await store.create_many([{"name": "N", "email": f"n{batch}-{i}@example.com"} for i in range(20)])
+        await store.close()
+
+    before = storage.bytes_written
+    asyncio.run(insertAll())
+    # Journal line, plus at most about twice that again for snapshot rewrites (journal >= snapshot at each one)
+    assert (storage.bytes_written - before) / 4000 < 4 * line
+    assert len(json.loads(path.read_bytes())) > 2000  # compactions did run
+    storage.unlock()
+    assert len(JournalStorage(str(path)).load()) == 6000
+
+
+def test_rotated_journal_is_replayed(storage):
+    storage.append([user(3)])
+    storage.rotate()
+    storage.append([user(4)])
+    # Crash before write_snapshot: both journals hold acknowledged inserts
+    assert [u["id"] for u in JournalStorage(str(storage.path)).load()] == [1, 2, 3, 4]
+    storage.append([user(5)])
+    storage.rotate()  # the earlier rotated journal is kept and extended
+    storage.write_snapshot(USERS + [user(3), user(4), user(5)])
+    assert not storage.has_journal()
+    assert [u["id"] for u in JournalStorage(str(storage.path)).load()] == [1, 2, 3, 4, 5]
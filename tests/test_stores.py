@@ -0,0 +1,132 @@
+import asyncio
+import json
+
+import pytest
+
+from sqlite_store import SqliteUserStore
+from storage import JournalStorage
+from store import BaseUserStore, DuplicateEmailError, UserStore
+
+USERS = [
+    {"id": 1, "name": "bob", "email": "Bob@Example.com", "address": "", "phone": ""},
+    {"id": 2, "name": "Anna", "email": "anna@example.com", "address": "", "phone": ""},
+    {"id": 3, "name": "ann", "email": "ann@example.com", "address": "", "phone": ""},
+]
+# Acknowledged before the last shutdown, only in the journal
+JOURNALED = {"id": 4, "name": "Andy", "email": "andy@example.com", "address": "", "phone": ""}
+
+
+@pytest.fixture(params=["json", "sqlite"])
+def store(request, tmp_path):
+    path = tmp_path / "users.json"
+    path.write_text(json.dumps(USERS))
+    JournalStorage(str(path)).append([JOURNALED])
+    if request.param == "json":
+        store = UserStore(JournalStorage(str(path)))
+        yield store
+        store.storage.unlock()
+    else:
+        yield SqliteUserStore(str(tmp_path / "users.db"), seed_path=str(path))
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def ids(users):
+    return [user["id"] for user in users]
+
+
+def test_partial_backend_cannot_be_constructed():
+    class Partial(BaseUserStore):
+        async def count(self):
+            return 0
+
+    with pytest.raises(TypeError):
+        Partial()
+
+
+def test_seeded_from_snapshot_and_journal(store):
+    async def check():
+        assert await store.count() == 4
+        assert await store.version() == 4
+        assert await store.get(4) == JOURNALED
+        assert await store.get(99) is None
+        assert ids(await store.all()) == [1, 2, 3, 4]
+    run(check())
+
+
+def test_page(store):
+    async def check():
+        assert [(ids(users), cursor) for users, cursor in [
+            await store.page(after=0, limit=3),
+            await store.page(after=3, limit=3),
+            await store.page(after=1, limit=3),
+            await store.page(after=4, limit=3),
+        ]] == [([1, 2, 3], 3), ([4], None), ([2, 3, 4], None), ([], None)]
+    run(check())
+
+
+def test_search(store):
+    async def check():
+        assert ids(await store.search(email="BOB@example.COM ")) == [1]
+        # Name prefix, case-insensitive, in (lowercased name, id) order
+        assert ids(await store.search(name="an")) == [4, 3, 2]
+        assert ids(await store.search(name="AN", limit=2)) == [4, 3]
+        assert ids(await store.search(name="ann")) == [3, 2]
+        assert ids(await store.search(email="anna@example.com", name="an")) == [2]
+        assert ids(await store.search(email="anna@example.com", name="b")) == []
+        assert await store.search(name="z") == []
+        assert await store.search() == []
+    run(check())
+
+
+def test_create_rejects_duplicate_email(store):
+    async def check():
+        assert await store.create({"name": "Cleo", "email": "cleo@example.com"}) == 5
+        with pytest.raises(DuplicateEmailError):
+            await store.create({"name": "Bobby", "email": " bob@EXAMPLE.com"})
+        assert await store.count() == 5
+        await store.close()
+    run(check())
+
+
+def test_create_many_reports_each_item(store):
+    async def check():
+        results = await store.create_many([
+            {"name": "Cleo", "email": "cleo@example.com"},
+            {"name": "Bob again", "email": "bob@example.com"},
+            {"name": "Cleo again", "email": "CLEO@example.com"},
+            {"name": "Dan"},
+            {"name": "Eve", "email": "eve@example.com"},
+        ])
+        assert results[0] == 5 and results[4] == 6
+        assert isinstance(results[1], DuplicateEmailError)
+        assert isinstance(results[2], DuplicateEmailError)
+        assert isinstance(results[3], Exception)
+        assert await store.version() == 6
+        await store.close()
+    run(check())
+
+
+def test_name_search_sees_new_users(store):
+    async def check():
+        assert ids(await store.search(name="a")) == [4, 3, 2]  # builds the name index
+        await store.create_many([
+            {"name": "Anne", "email": "anne@example.com"},
+            {"name": "aaron", "email": "aaron@example.com"},
+            {"name": "Ann", "email": "ann2@example.com"},
+        ])
+        assert ids(await store.search(name="a")) == [6, 4, 3, 7, 2, 5]
+        assert ids(await store.search(name="ann")) == [3, 7, 2, 5]
+        await store.close()
+    run(check())
+
+
+def test_concurrent_creates_get_distinct_ids(store):
+    async def check():
+        created = await asyncio.gather(*[store.create({"name": f"N{i}", "email": f"n{i}@example.com"}) for i in range(10)])
+        assert sorted(created) == list(range(5, 15))
+        assert ids(await store.all()) == list(range(1, 15))
+        await store.close()
+    run(check())